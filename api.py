@@ -0,0 +1,199 @@
+# api.py
+"""Read-only JSON API for programs (lobby display, mobile program).
+
+Everything is selected as plain row tuples and serialized directly, without
+building ORM objects. Lists use keyset pagination: pass the returned
+``next`` value back as ``after``.
+
+    GET /api/productions?limit=20&after=<cursor>
+    GET /api/productions/<id>?fields=cast,songs
+    GET /api/students?limit=100&after=<cursor>
+    GET /api/students/search?q=sim&limit=10
+    GET /api/students/<id>/sheet             (roles, songs and numbers per act)
+"""
+
+import base64
+import hashlib
+import json
+
+from flask import Blueprint, abort, jsonify, request
+from sqlalchemy import select, tuple_
+from werkzeug.exceptions import HTTPException
+
+from models import db, Production, Role, RoleAssignment, Student, CrewAssignment, TeamMember, Song, Thanks
+from cache import cached_page, conditional_page
+from routes import listing_etag, production_etag
+from search import search_students
+import performers
+
+api_bp = Blueprint('api', __name__)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+PRODUCTION_COLUMNS = (Production.id, Production.title, Production.subtitle, Production.cover_filename,
+                      Production.dates_text, Production.location, Production.price, Production.copyright,
+                      Production.notes, Production.revision)
+SECTIONS = ('team', 'cast', 'songs', 'crew', 'thanks')
+
+
+@api_bp.errorhandler(HTTPException)
+def json_error(exc):
+    # abort() in the API answers {"error": ...} rather than Flask's HTML error page
+    return jsonify(error=exc.description), exc.code
+
+
+def _limit():
+    try:
+        return max(1, min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        abort(400, 'limit must be an integer')
+
+
+def _decode_cursor(raw):
+    try:
+        return json.loads(base64.urlsafe_b64decode(raw.encode()))
+    except (ValueError, TypeError):
+        abort(400, 'invalid cursor')
+
+
+def _encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def _fields():
+    raw = request.args.get('fields')
+    if not raw:
+        return SECTIONS
+    requested = {f.strip() for f in raw.split(',')}
+    return tuple(f for f in SECTIONS if f in requested)
+
+
+def _rows(stmt):
+    result = db.session.execute(stmt)
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+def _page(rows, limit, cursor_of):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {'items': rows, 'next': _encode_cursor(cursor_of(rows[-1])) if has_more else None}
+
+
+# section loaders: one query each, rows straight to dicts
+def _team(pid):
+    return _rows(select(TeamMember.id, TeamMember.name, TeamMember.position)
+                 .where(TeamMember.production_id == pid).order_by(TeamMember.id))
+
+
+def _cast(pid):
+    result = db.session.execute(
+        select(Role.id, Role.name, Role.is_group, Student.id, Student.name)
+        .select_from(Role)
+        .outerjoin(RoleAssignment, RoleAssignment.role_id == Role.id)
+        .outerjoin(Student, Student.id == RoleAssignment.student_id)
+        .where(Role.production_id == pid)
+        .order_by(Role.order_index, Role.id, RoleAssignment.id))
+    cast, by_role = [], {}
+    for role_id, role_name, is_group, student_id, student_name in result:
+        entry = by_role.get(role_id)
+        if entry is None:
+            entry = by_role[role_id] = {'id': role_id, 'role': role_name, 'is_group': bool(is_group), 'students': []}
+            cast.append(entry)
+        if student_id is not None:
+            entry['students'].append({'id': student_id, 'name': student_name})
+    return cast
+
+
+def _songs(pid):
+    return _rows(select(Song.id, Song.act, Song.title, Song.performers_text.label('performers'))
+                 .where(Song.production_id == pid).order_by(Song.act, Song.order_index, Song.id))
+
+
+def _crew(pid):
+    return _rows(select(CrewAssignment.id, Student.id.label('student_id'), Student.name,
+                        CrewAssignment.responsibility)
+                 .join(Student, Student.id == CrewAssignment.student_id)
+                 .where(CrewAssignment.production_id == pid).order_by(CrewAssignment.id))
+
+
+def _thanks(pid):
+    return _rows(select(Thanks.id, Thanks.text).where(Thanks.production_id == pid).order_by(Thanks.id))
+
+
+LOADERS = {'team': _team, 'cast': _cast, 'songs': _songs, 'crew': _crew, 'thanks': _thanks}
+
+
+def _digest(*parts):
+    # fixed-length cache keys, however long the query string or the listing ETag value
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _list_key():
+    return f'api:productions:{_digest(request.query_string, listing_etag())}'
+
+
+def _detail_key(production_id):
+    return f'api:production:{production_id}:{_digest(_fields(), production_etag(production_id))}'
+
+
+@api_bp.route('/productions')
+@conditional_page(lambda: f'{listing_etag()}:{request.query_string.decode()}', renders_flashes=False)
+@cached_page(_list_key, renders_flashes=False)
+def productions():
+    limit = _limit()
+    stmt = select(*PRODUCTION_COLUMNS).order_by(Production.id).limit(limit + 1)
+    if request.args.get('after'):
+        after = _decode_cursor(request.args['after'])
+        if not isinstance(after, int) or isinstance(after, bool):
+            abort(400, 'invalid cursor')
+        stmt = stmt.where(Production.id > after)
+    return jsonify(_page(_rows(stmt), limit, lambda row: row['id']))
+
+
+@api_bp.route('/productions/<int:production_id>')
+@conditional_page(lambda production_id: f'{production_etag(production_id)}:{",".join(_fields())}',
+                  renders_flashes=False)
+@cached_page(_detail_key, renders_flashes=False)
+def production(production_id):
+    rows = _rows(select(*PRODUCTION_COLUMNS).where(Production.id == production_id))
+    if not rows:
+        abort(404, 'no such production')
+    data = rows[0]
+    for field in _fields():
+        data[field] = LOADERS[field](production_id)
+    return jsonify(data)
+
+
+@api_bp.route('/students')
+def students():
+    limit = _limit()
+    stmt = (select(Student.id, Student.name, Student.sex, Student.year)
+            .order_by(Student.name, Student.id).limit(limit + 1))
+    if request.args.get('after'):
+        after = _decode_cursor(request.args['after'])
+        if not (isinstance(after, list) and len(after) == 2 and isinstance(after[0], str)
+                and isinstance(after[1], int) and not isinstance(after[1], bool)):
+            abort(400, 'invalid cursor')
+        name, student_id = after
+        stmt = stmt.where(tuple_(Student.name, Student.id) > tuple_(name, student_id))
+    resp = jsonify(_page(_rows(stmt), limit, lambda row: [row['name'], row['id']]))
+    resp.add_etag()
+    return resp.make_conditional(request)
+
+
+@api_bp.route('/students/<int:student_id>/sheet')
+def student_sheet(student_id):
+    name = db.session.execute(select(Student.name).where(Student.id == student_id)).scalar()
+    if name is None:
+        abort(404, 'no such student')
+    return jsonify({'id': student_id, 'name': name, 'productions': performers.student_sheet(student_id)})
+
+
+@api_bp.route('/students/search')
+def student_search():
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        abort(400, 'limit must be an integer')
+    return jsonify(search_students(request.args.get('q', ''), limit))
@@ -2,33 +2,97 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 import os
 
-db = SQLAlchemy()
+from cache import page_cache
+import compression
+from instrumentation import instrumentation
+from database import RoutingSession, configure_database, install_pragmas
+from images import cover_sources
+from assets import asset_url, static_view
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def create_app():
     app = Flask(__name__, static_folder='static', template_folder='templates')
     basedir = os.path.abspath(os.path.dirname(__file__))
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(basedir, "musical.db")}'
+    # SQLALCHEMY_DATABASE_URI / DATABASE_URL, an optional read replica, pool size and SQLITE_PROFILE
+    # come from the environment (see database.py)
+    configure_database(app, f'sqlite:///{os.path.join(basedir, "musical.db")}')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
     app.secret_key = 'dev-secret-change-me'
+    # fail loudly when a page exceeds its query budget (see snapshot.query_budget)
+    app.config['ASSERT_QUERY_BUDGET'] = os.environ.get('ASSERT_QUERY_BUDGET') == '1'
+
+    # rendered viewer pages: 'memory' per worker, or 'file' to share across gunicorn workers
+    app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+    app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 300))
+    if os.environ.get('PAGE_CACHE_DIR'):
+        app.config['PAGE_CACHE_DIR'] = os.environ['PAGE_CACHE_DIR']
 
     db.init_app(app)
+    install_pragmas(app, db)
+    app.add_template_global(cover_sources)
+
+    # fingerprinted static files and content-hashed uploads are cached for a year
+    app.add_template_global(asset_url)
+    app.view_functions['static'] = static_view
+    # let a front proxy send file bytes: USE_X_SENDFILE=1 (Apache/lighttpd) or
+    # X_ACCEL_STATIC / X_ACCEL_UPLOADS internal locations (nginx)
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+    app.config['X_ACCEL_REDIRECT'] = {}
+    if os.environ.get('X_ACCEL_STATIC'):
+        app.config['X_ACCEL_REDIRECT'][app.static_folder] = os.environ['X_ACCEL_STATIC']
+    if os.environ.get('X_ACCEL_UPLOADS'):
+        app.config['X_ACCEL_REDIRECT'][app.config['UPLOAD_FOLDER']] = os.environ['X_ACCEL_UPLOADS']
+    page_cache.init_app(app)
+
+    # whitespace stripped from templates when they compile, and HTML/JSON of at least
+    # COMPRESS_MIN_SIZE bytes sent with brotli (if installed) or gzip (see compression.py)
+    app.config['MINIFY_TEMPLATES'] = os.environ.get('MINIFY_TEMPLATES', '1') == '1'
+    app.config['COMPRESS_RESPONSES'] = os.environ.get('COMPRESS_RESPONSES', '1') == '1'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    app.config['GZIP_LEVEL'] = int(os.environ.get('GZIP_LEVEL', 6))
+    app.config['BROTLI_QUALITY'] = int(os.environ.get('BROTLI_QUALITY', 5))
+    compression.init_app(app)
+
+    # Server-Timing on every response, /metrics, ?_profile=1 when ALLOW_PROFILING=1 (or debug)
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+    app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 500))
+    app.config['ALLOW_PROFILING'] = os.environ.get('ALLOW_PROFILING') == '1'
+    instrumentation.init_app(app, db)
+
+    # lobby live updates: the SSE server runs separately (`flask --app app live-server`, see live.py)
+    app.config['LIVE_UPDATES_URL'] = os.environ.get('LIVE_UPDATES_URL', '').rstrip('/')
+    app.config['LIVE_NOTIFY_ADDR'] = os.environ.get('LIVE_NOTIFY_ADDR')
+    app.config['LIVE_POLL_INTERVAL'] = float(os.environ.get('LIVE_POLL_INTERVAL', 1.0))
 
-    # Create DB and uploads directory early so schema is ready before routes import/use it
-    with app.app_context():
-        db.create_all()
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # static export of the viewer pages (see static_site.py); STATIC_SITE_AUTO re-exports after every edit
+    app.config['STATIC_SITE_FOLDER'] = os.environ.get('STATIC_SITE_FOLDER', os.path.join(app.instance_path, 'site'))
+    app.config['STATIC_SITE_AUTO'] = bool(os.environ.get('STATIC_SITE_AUTO'))
+
+    # JSONL archives written by "Archive season" (archive.archive_productions) are kept here
+    app.config['ARCHIVE_FOLDER'] = os.environ.get('ARCHIVE_FOLDER', os.path.join(app.instance_path, 'archives'))
+
+    # printable program PDFs, rendered on a background pool (see program.py)
+    app.config['PROGRAM_FOLDER'] = os.environ.get('PROGRAM_FOLDER', os.path.join(app.instance_path, 'programs'))
+    app.config['PROGRAM_WORKERS'] = int(os.environ.get('PROGRAM_WORKERS', 2))
+    # seconds a download waits for a fresh render before answering "being prepared"
+    app.config['PROGRAM_WAIT'] = float(os.environ.get('PROGRAM_WAIT', 5))
+
+    # Schema creation/migration and seeding are one-time steps run from the CLI
+    # (`flask --app app init-db`, `flask --app app seed`), not on every boot or request.
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
     # register blueprints (view and edit interfaces)
     from routes import view_bp, edit_bp
     app.register_blueprint(view_bp)
     app.register_blueprint(edit_bp, url_prefix='/edit')
-    
-    # seed initial production if none exists
-    from seed_mermaid import seed_mermaid
-    with app.app_context():
-        seed_mermaid(app, db)
+    from api import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api')
 
+    from commands import register_commands
+    register_commands(app)
+    
     return app
 
 app = create_app()
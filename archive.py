@@ -0,0 +1,312 @@
+# archive.py
+"""Whole-production export/import in a compact JSON archive.
+
+An archive holds one production: its fields, an optional embedded cover, and
+one ``{"columns": [...], "rows": [[...], ...]}`` table per child table. Rows
+reference students and roles by their position in the ``students`` / ``roles``
+tables, so database ids never leave the source database. Several archives can
+be concatenated one per line (JSONL) to move many productions at once.
+
+Importing takes a fixed number of statements however large the production:
+students are deduplicated by name against the roster, every table is
+inserted with one executemany, and song performers are linked to roles
+set-wise (performers.link_songs).
+"""
+
+import base64
+import binascii
+import io
+import json
+import os
+
+from sqlalchemy import delete, insert, select
+from werkzeug.datastructures import FileStorage
+
+from models import (db, Production, Role, RoleAssignment, Student, CrewAssignment, TeamMember, Song, Thanks,
+                    SongPerformer, StudentSong)
+from importer import insert_ignoring_duplicates
+from ordering import GAP
+from performers import link_songs
+
+FORMAT = 'musical-production'
+VERSION = 1
+PRODUCTION_FIELDS = ('title', 'subtitle', 'dates_text', 'location', 'price', 'copyright', 'notes')
+TABLES = {
+    'students': ('name', 'sex', 'year'),
+    'roles': ('name', 'is_group', 'order_index'),
+    'role_assignments': ('role', 'student'),
+    'crew': ('student', 'responsibility'),
+    'team': ('name', 'position', 'notes'),
+    'songs': ('act', 'title', 'order_index', 'performers_text'),
+    'thanks': ('text',),
+}
+# what each column may hold, checked before anything is inserted
+COLUMN_KINDS = {
+    'production': ('text',) + ('text?',) * (len(PRODUCTION_FIELDS) - 1),
+    'students': ('text', 'text?', 'text?'),
+    'roles': ('text', 'bool?', 'int?'),
+    'role_assignments': ('int', 'int'),
+    'crew': ('int', 'text?'),
+    'team': ('text', 'text', 'text?'),
+    'songs': ('int?', 'text', 'int?', 'text?'),
+    'thanks': ('text',),
+}
+KINDS = {
+    'text': ('a non-empty string', lambda v: isinstance(v, str) and v.strip() != ''),
+    'text?': ('a string or null', lambda v: v is None or isinstance(v, str)),
+    'int': ('an integer', lambda v: type(v) is int),
+    'int?': ('an integer or null', lambda v: v is None or type(v) is int),
+    'bool?': ('true, false or null', lambda v: v is None or isinstance(v, bool)),
+}
+
+
+class ArchiveError(ValueError):
+    """The data is not a production archive this version can read."""
+
+
+def _table(name, rows):
+    return {'columns': list(TABLES[name]), 'rows': [list(r) for r in rows]}
+
+
+def export_production(production_id, upload_folder=None):
+    """Serialize a production to an archive dict, or None if it does not exist.
+
+    With upload_folder, a cover stored under /uploads is embedded (base64).
+    """
+    prod = db.session.execute(select(Production.cover_filename, *(getattr(Production, f) for f in PRODUCTION_FIELDS))
+                              .where(Production.id == production_id)).first()
+    if prod is None:
+        return None
+    students, student_index = [], {}
+
+    def student(name, sex, year):
+        if name not in student_index:
+            student_index[name] = len(students)
+            students.append((name, sex, year))
+        return student_index[name]
+
+    roles = db.session.execute(select(Role.id, Role.name, Role.is_group, Role.order_index)
+                               .where(Role.production_id == production_id)
+                               .order_by(Role.order_index, Role.id)).all()
+    role_index = {r.id: i for i, r in enumerate(roles)}
+    assignments = [(role_index[role_id], student(name, sex, year)) for role_id, name, sex, year in db.session.execute(
+        select(RoleAssignment.role_id, Student.name, Student.sex, Student.year)
+        .join(Student, Student.id == RoleAssignment.student_id)
+        .join(Role, Role.id == RoleAssignment.role_id)
+        .where(Role.production_id == production_id).order_by(RoleAssignment.id))]
+    crew = [(student(name, sex, year), responsibility) for name, sex, year, responsibility in db.session.execute(
+        select(Student.name, Student.sex, Student.year, CrewAssignment.responsibility)
+        .join(Student, Student.id == CrewAssignment.student_id)
+        .where(CrewAssignment.production_id == production_id).order_by(CrewAssignment.id))]
+    team = db.session.execute(select(TeamMember.name, TeamMember.position, TeamMember.notes)
+                              .where(TeamMember.production_id == production_id).order_by(TeamMember.id)).all()
+    songs = db.session.execute(select(Song.act, Song.title, Song.order_index, Song.performers_text)
+                               .where(Song.production_id == production_id)
+                               .order_by(Song.act, Song.order_index, Song.id)).all()
+    thanks = db.session.execute(select(Thanks.text)
+                                .where(Thanks.production_id == production_id).order_by(Thanks.id)).all()
+
+    archive = {
+        'format': FORMAT,
+        'version': VERSION,
+        'production': dict(zip(PRODUCTION_FIELDS, prod[1:])),
+        'students': _table('students', students),
+        'roles': _table('roles', [r[1:] for r in roles]),
+        'role_assignments': _table('role_assignments', assignments),
+        'crew': _table('crew', crew),
+        'team': _table('team', team),
+        'songs': _table('songs', songs),
+        'thanks': _table('thanks', thanks),
+    }
+    cover = prod.cover_filename
+    if cover and upload_folder and cover.startswith('/uploads/'):
+        name = cover[len('/uploads/'):]
+        try:
+            with open(os.path.join(upload_folder, name), 'rb') as f:
+                archive['cover'] = {'filename': name, 'data': base64.b64encode(f.read()).decode()}
+        except OSError:
+            pass
+    return archive
+
+
+def _check(name, rows, columns):
+    for column, kind in zip(columns, COLUMN_KINDS[name]):
+        description, valid = KINDS[kind]
+        if not all(valid(r[column]) for r in rows):
+            raise ArchiveError(f'{name} {column} must be {description}')
+
+
+def _rows(archive, name):
+    """Rows of an archive table as dicts keyed by this version's column names, type-checked."""
+    table = archive.get(name) or {'columns': TABLES[name], 'rows': []}
+    try:
+        columns, rows = table['columns'], table['rows']
+        rows = [{c: row[i] if i is not None else None for c, i in
+                 ((c, columns.index(c) if c in columns else None) for c in TABLES[name])} for row in rows]
+    except (KeyError, TypeError, ValueError, IndexError, AttributeError) as exc:
+        raise ArchiveError(f'malformed {name} table') from exc
+    _check(name, rows, TABLES[name])
+    return rows
+
+
+def _running_order(rows):
+    """order_index values for imported rows: the archive's own, or table order when it has none."""
+    if len({r['order_index'] or 0 for r in rows}) == len(rows):
+        return [r['order_index'] or 0 for r in rows]
+    return [(i + 1) * GAP for i in range(len(rows))]
+
+
+def import_production(archive, upload_folder=None):
+    """Create a new production from an archive dict; returns (production_id, counts).
+
+    Does not commit. Students already on the roster (same name) are reused
+    rather than duplicated. With upload_folder, an embedded cover is stored
+    like an uploaded one and the background variant job is returned in
+    counts['cover_job'].
+    """
+    if not isinstance(archive, dict) or archive.get('format') != FORMAT:
+        raise ArchiveError('not a production archive')
+    version = archive.get('version', 0)
+    if not isinstance(version, int) or isinstance(version, bool):
+        raise ArchiveError('archive version must be an integer')
+    if version > VERSION:
+        raise ArchiveError(f'archive version {version} is newer than supported ({VERSION})')
+    production = archive.get('production') or {}
+    if not isinstance(production, dict):
+        raise ArchiveError('malformed production')
+    fields = {f: production.get(f) for f in PRODUCTION_FIELDS}
+    _check('production', [fields], PRODUCTION_FIELDS)
+    students, roles = _rows(archive, 'students'), _rows(archive, 'roles')
+    role_rows, crew_rows = _rows(archive, 'role_assignments'), _rows(archive, 'crew')
+    team, songs, thanks = _rows(archive, 'team'), _rows(archive, 'songs'), _rows(archive, 'thanks')
+
+    cover_job, cover = None, None
+    if upload_folder and archive.get('cover'):
+        from routes import allowed_file
+        try:
+            filename, data = archive['cover']['filename'], base64.b64decode(archive['cover']['data'], validate=True)
+        except (KeyError, TypeError, binascii.Error) as exc:
+            raise ArchiveError('malformed cover') from exc
+        if not isinstance(filename, str) or not allowed_file(filename):
+            raise ArchiveError('cover must be a png, jpg or gif file')
+        cover = FileStorage(io.BytesIO(data), filename=filename)
+
+    # every role/student reference must be an index into its table (a negative one would wrap around)
+    for table, rows, column, size in (('role_assignments', role_rows, 'role', len(roles)),
+                                      ('role_assignments', role_rows, 'student', len(students)),
+                                      ('crew', crew_rows, 'student', len(students))):
+        if not all(type(r[column]) is int and 0 <= r[column] < size for r in rows):
+            raise ArchiveError(f'{table} refers to a missing {column}')
+
+    if cover is not None:
+        from images import save_cover
+        fields['cover_filename'], cover_job = save_cover(cover, upload_folder)
+
+    production_id = db.session.execute(insert(Production).values(**fields)).inserted_primary_key[0]
+
+    # students: insert the unknown names, then one lookup maps every archive index to an id
+    names = [s['name'] for s in students]
+    if students:
+        db.session.execute(insert_ignoring_duplicates(),
+                           [{'name': s['name'], 'sex': s['sex'] or '', 'year': s['year'] or ''} for s in students])
+    ids_by_name = dict(db.session.execute(select(Student.name, Student.id).where(Student.name.in_(names)))
+                       .all()) if names else {}
+    student_ids = [ids_by_name[n] for n in names]
+
+    # roles are unique per (name, is_group) within a production, which is how they are mapped back
+    unique_roles = {}
+    for r in roles:
+        unique_roles.setdefault((r['name'], bool(r['is_group'])), r)
+    role_order = _running_order(list(unique_roles.values()))
+    if roles:
+        db.session.execute(insert(Role), [{'production_id': production_id, 'name': name, 'is_group': is_group,
+                                           'order_index': index}
+                                          for (name, is_group), index in zip(unique_roles, role_order)])
+    role_ids = {(name, bool(is_group)): role_id for role_id, name, is_group in db.session.execute(
+        select(Role.id, Role.name, Role.is_group).where(Role.production_id == production_id))}
+    role_id_at = [role_ids[(r['name'], bool(r['is_group']))] for r in roles]
+
+    assignments = dict.fromkeys((role_id_at[a['role']], student_ids[a['student']]) for a in role_rows)
+    crew = [{'production_id': production_id, 'student_id': student_ids[c['student']],
+             'responsibility': c['responsibility']} for c in crew_rows]
+    batches = [
+        (RoleAssignment, [{'role_id': r, 'student_id': s} for r, s in assignments]),
+        (CrewAssignment, crew),
+        (TeamMember, [dict(t, production_id=production_id) for t in team]),
+        (Song, [dict(s, production_id=production_id, act=s['act'] or 1, order_index=index)
+                for s, index in zip(songs, _running_order(songs))]),
+        (Thanks, [dict(t, production_id=production_id) for t in thanks]),
+    ]
+    counts = {'production_id': production_id, 'students': len(students), 'roles': len(roles),
+              'cover_job': cover_job}
+    for model, rows in batches:
+        if rows:
+            db.session.execute(insert(model), rows)
+        counts[model.__tablename__] = len(rows)
+    counts['song_performers'] = link_songs(production_id=production_id)
+    return production_id, counts
+
+
+def delete_productions(production_ids):
+    """Delete productions and all their rows with one set-based DELETE per table; returns how many.
+
+    Does not commit. Nothing is loaded into the session: each child table is
+    emptied with a single ``DELETE ... WHERE <parent> IN (SELECT ...)``,
+    deepest first, and the ON DELETE CASCADE foreign keys then have nothing
+    left to find row by row.
+    """
+    ids = list(production_ids)
+    if not ids:
+        return 0
+    roles = select(Role.id).where(Role.production_id.in_(ids))
+    songs = select(Song.id).where(Song.production_id.in_(ids))
+    statements = [
+        delete(StudentSong).where(StudentSong.song_id.in_(songs)),
+        delete(SongPerformer).where(SongPerformer.song_id.in_(songs)),
+        delete(RoleAssignment).where(RoleAssignment.role_id.in_(roles)),
+    ] + [delete(model).where(model.production_id.in_(ids))
+         for model in (Role, Song, CrewAssignment, TeamMember, Thanks)]
+    for statement in statements:
+        db.session.execute(statement.execution_options(synchronize_session=False))
+    return db.session.execute(delete(Production).where(Production.id.in_(ids))
+                              .execution_options(synchronize_session=False)).rowcount
+
+
+def archive_productions(production_ids, output, upload_folder=None):
+    """Write each production to `output` as JSONL, then delete them all; returns the ids archived.
+
+    Does not commit, so a failed write leaves the database untouched. Ids that
+    do not exist are skipped.
+    """
+    archived = []
+    for production_id in production_ids:
+        archive = export_production(production_id, upload_folder)
+        if archive is not None:
+            output.write(dump_archive(archive) + '\n')
+            archived.append(production_id)
+    delete_productions(archived)
+    return archived
+
+
+def load_archives(stream):
+    """Parse a JSON archive or JSONL stream of archives into a list of dicts."""
+    text = stream.read()
+    if isinstance(text, bytes):
+        text = text.decode('utf-8-sig')
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        data = json.loads(text)
+        return data if isinstance(data, list) else [data]
+    except json.JSONDecodeError:
+        pass
+    try:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    except json.JSONDecodeError as exc:
+        raise ArchiveError(f'invalid JSON: {exc}') from exc
+
+
+def dump_archive(archive):
+    """Compact one-line JSON (so archives can be concatenated as JSONL)."""
+    return json.dumps(archive, ensure_ascii=False, separators=(',', ':'))
@@ -0,0 +1,270 @@
+# asgi.py
+"""Optional ASGI entry point: the audience pages served on an event loop.
+
+    pip install uvicorn aiosqlite
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+With sync gunicorn workers, a phone on weak auditorium Wi-Fi holds a whole
+worker until it has read its page. Here ``GET /viewer`` and
+``GET /viewer/production/<id>`` are handled as coroutines: the ETag check,
+the page cache lookup and (on a miss) the snapshot queries run on an
+AsyncSession over aiosqlite, and a slow reader only holds a socket.
+Responses, ETags and page-cache entries are the same as the Flask views
+(cache.conditional_page / cached_page), so both modes can run side by side.
+
+Everything else (director and edit routes, the API, PDFs, static files) is
+passed unchanged to the Flask app, which runs on a thread pool of
+ASGI_WSGI_THREADS threads. Visitors with pending flash messages or a
+recent edit of their own (database.wrote_recently) and databases other
+than SQLite are also handed to Flask. With a read replica configured the
+ETag check reads the replica and cache misses render from the primary, as
+in database.py.
+
+The Flask before/after_request hooks do not run for the async pages. Each
+one is still recorded in the /metrics latency histogram and response counts
+under the Flask endpoint name (view.viewer_home, view.viewer_production)
+and carries a ``Server-Timing`` total. The DB/template breakdown and the
+?_profile= profiler are only available when Flask serves the page.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import render_template, request, session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import app as flask_app
+from cache import HOME_KEY, page_cache, production_key, template_fingerprint, unpack_entry
+from compression import cached_body
+from database import REPLICA_BIND, wrote_recently
+from instrumentation import instrumentation
+from models import Production
+from routes import LISTING_ETAG_QUERY
+from snapshot import build_snapshot, snapshot_statements
+
+PRODUCTION_PATH = re.compile(r'^/viewer/production/(\d+)$')
+
+
+def async_url(uri):
+    """The aiosqlite URL for a SQLite database URI, or None for other databases."""
+    if not uri.startswith('sqlite'):
+        return None
+    return 'sqlite+aiosqlite' + uri[len('sqlite'):]
+
+
+class ViewerApp:
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_pool = ThreadPoolExecutor(int(os.environ.get('ASGI_WSGI_THREADS', 8)),
+                                            thread_name_prefix='wsgi')
+        pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+        replica = app.config.get('SQLALCHEMY_BINDS', {}).get(REPLICA_BIND)
+        urls = [async_url(app.config['SQLALCHEMY_DATABASE_URI'])]
+        if replica:
+            urls.append(async_url(replica['url']))
+        self.engines, self.sessions = [], None
+        if None not in urls:
+            self.engines = [self._engine(urls[0], pragmas)]
+            if replica:  # read-only, like database.install_pragmas
+                self.engines.append(self._engine(urls[1], dict(pragmas, query_only='ON')))
+            # ETags and cache lookups read the replica; cache misses render from the primary
+            self.sessions = async_sessionmaker(self.engines[0], class_=AsyncSession, expire_on_commit=False)
+            self.read_sessions = async_sessionmaker(self.engines[-1], class_=AsyncSession, expire_on_commit=False)
+
+    @staticmethod
+    def _engine(url, pragmas):
+        engine = create_async_engine(url)
+
+        @event.listens_for(engine.sync_engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
+        return engine
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        if self.sessions is not None and scope['method'] == 'GET':
+            path = scope['path']
+            if path == '/viewer':
+                return await self.page(scope, receive, send, 'view.viewer_home', HOME_KEY,
+                                       self.home_etag, self.render_home)
+            match = PRODUCTION_PATH.match(path)
+            if match:
+                pid = int(match.group(1))
+                return await self.page(scope, receive, send, 'view.viewer_production', production_key(pid),
+                                       lambda s: self.production_etag(s, pid),
+                                       lambda s: self.render_production(s, pid))
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for engine in self.engines:
+                    await engine.dispose()
+                self.wsgi_pool.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # -- async viewer pages -------------------------------------------------
+    def _request_context(self, scope):
+        headers = [(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers']]
+        return self.app.test_request_context(scope['path'], headers=headers,
+                                             query_string=scope['query_string'].decode('latin-1'))
+
+    @staticmethod
+    async def home_etag(db):
+        return repr((await db.execute(LISTING_ETAG_QUERY)).all())
+
+    @staticmethod
+    async def production_etag(db, production_id):
+        revision = await db.scalar(select(Production.revision).where(Production.id == production_id))
+        return None if revision is None else f'{production_id}:{revision}'
+
+    @staticmethod
+    async def render_home(db):
+        prods = (await db.execute(select(Production).order_by(Production.title))).scalars().all()
+        return 'viewer.jinja', {'productions': prods}
+
+    @staticmethod
+    async def render_production(db, production_id):
+        production, thanks = snapshot_statements(production_id)
+        prod = (await db.execute(production)).scalars().first()
+        if prod is None:  # deleted since the ETag check
+            return None
+        thanks = (await db.execute(thanks)).scalars().all()
+        return 'viewer_production.jinja', build_snapshot(prod, thanks)
+
+    async def page(self, scope, receive, send, endpoint, key, etag_fn, render_fn):
+        started = time.perf_counter()
+        with self._request_context(scope):
+            if '_flashes' in session or wrote_recently():
+                return await self.wsgi(scope, receive, send)
+            fingerprint = template_fingerprint()
+            if_none_match = request.if_none_match
+        async with self.read_sessions() as db:
+            etag_value = await etag_fn(db)
+            if etag_value is None:  # unknown production: Flask renders the 404
+                return await self.wsgi(scope, receive, send)
+            etag = hashlib.sha1(f'{fingerprint}:{etag_value}'.encode()).hexdigest()
+            headers = [(b'etag', f'W/"{etag}"'.encode()), (b'cache-control', b'no-cache')]
+            if if_none_match.contains_weak(etag):
+                return await self._finish(send, endpoint, started, 304, headers, b'')
+            cached = page_cache.get(key, etag)  # another process may have cached it for an older ETag
+            if cached is not None:
+                body, mimetype, encoded, _ = unpack_entry(cached)
+                headers.append((b'x-cache', b'HIT'))
+            else:
+                async with self.sessions() as primary:
+                    rendered = await render_fn(primary)
+                if rendered is None:  # gone by now: Flask renders the 404
+                    return await self.wsgi(scope, receive, send)
+                template, context = rendered
+                with self._request_context(scope):
+                    body = render_template(template, **context).encode()
+                mimetype, encoded = 'text/html', {}
+                headers.append((b'x-cache', b'MISS'))
+        with self._request_context(scope):
+            data, encoding, changed = cached_body(body, mimetype, encoded)
+        if changed or cached is None:
+            page_cache.set(key, (body, mimetype, encoded, etag))
+        headers.append((b'vary', b'Accept-Encoding'))
+        if encoding:
+            headers.append((b'content-encoding', encoding.encode()))
+        headers.append((b'content-type', f'{mimetype}; charset=utf-8'.encode()))
+        await self._finish(send, endpoint, started, 200, headers, data)
+
+    async def _finish(self, send, endpoint, started, status, headers, body):
+        # what instrumentation's after_request hook does for Flask responses
+        total = time.perf_counter() - started
+        instrumentation.record(endpoint, 'GET', status, total)
+        await self._send(send, status, headers + [(b'server-timing', f'total;dur={total * 1000:.2f}'.encode())],
+                         body)
+
+    @staticmethod
+    async def _send(send, status, headers, body):
+        headers = headers + [(b'content-length', str(len(body)).encode())]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # -- everything else: the Flask app on a thread pool ----------------------
+    async def wsgi(self, scope, receive, send):
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        environ = self._environ(scope, body)
+        status, headers, chunks = await asyncio.get_running_loop().run_in_executor(
+            self.wsgi_pool, self._call_wsgi, environ)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    @staticmethod
+    def _environ(scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+            'PATH_INFO': scope['path'].encode().decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+            'REMOTE_ADDR': client[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[name] = value
+            else:
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    def _call_wsgi(self, environ):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        result = self.app.wsgi_app(environ, start_response)
+        try:
+            chunks = [chunk for chunk in result if chunk]
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'], chunks
+
+
+application = ViewerApp(flask_app)
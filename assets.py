@@ -0,0 +1,118 @@
+# assets.py
+"""Static and upload delivery.
+
+- asset_url(): url_for('static') plus a ``v=<content hash>`` query argument;
+  requests carrying the hash are served as immutable for a year.
+- content-hashed uploads (see images.py) are immutable by name.
+- precompressed ``.br`` / ``.gz`` siblings are sent when the client accepts them
+  (create them with `flask --app app compress-assets`).
+- with X_ACCEL_REDIRECT set (nginx) or USE_X_SENDFILE (Apache/lighttpd) the
+  front proxy sends the bytes instead of the Python worker.
+Range and conditional requests are handled by send_from_directory.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+from werkzeug.exceptions import NotFound
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+HASHED_UPLOAD = re.compile(r'^[0-9a-f]{20}(-\d+)?\.[a-z0-9]+$')
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+_hashes = {}
+
+
+def file_hash(path):
+    """Short content hash of a file, recomputed only when its mtime changes."""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    _hashes[path] = (mtime, digest)
+    return digest
+
+
+def asset_url(filename):
+    """url_for('static', filename=...) with a content fingerprint for far-future caching."""
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return url_for('static', filename=filename)
+    return url_for('static', filename=filename, v=file_hash(path))
+
+
+def send_asset(directory, filename, immutable=False):
+    """send_from_directory with precompressed siblings, cache headers and proxy offload."""
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    encoding = None
+    accepted = request.accept_encodings
+    for enc, ext in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[enc] and os.path.isfile(path + ext):
+            encoding, filename = enc, filename + ext
+            break
+
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    accel = current_app.config.get('X_ACCEL_REDIRECT', {}).get(directory)
+    if accel:
+        resp = current_app.response_class(mimetype=mimetype)
+        resp.headers['X-Accel-Redirect'] = accel.rstrip('/') + '/' + filename
+    else:
+        resp = send_from_directory(directory, filename, mimetype=mimetype, max_age=None)
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    if encoding or os.path.isfile(path + '.gz') or os.path.isfile(path + '.br'):
+        resp.vary.add('Accept-Encoding')
+    resp.headers['Cache-Control'] = IMMUTABLE if immutable else 'no-cache'
+    return resp
+
+
+def static_view(filename):
+    """Replacement for Flask's built-in static endpoint (registered in create_app).
+
+    Only a ?v= matching the file's current hash (as asset_url writes it) is
+    cached as immutable; a stale or mistyped one gets the default headers.
+    """
+    version = request.args.get('v')
+    path = safe_join(current_app.static_folder, filename) if version else None
+    immutable = path is not None and os.path.isfile(path) and version == file_hash(path)
+    return send_asset(current_app.static_folder, filename, immutable=immutable)
+
+
+def upload_view(filename):
+    return send_asset(current_app.config['UPLOAD_FOLDER'], filename,
+                      immutable=bool(HASHED_UPLOAD.match(filename)))
+
+
+def compress_tree(folder):
+    """Write .gz (and .br when brotli is installed) siblings for text assets under folder."""
+    written = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            outputs = [('.gz', gzip.compress(data, 9, mtime=0))]
+            if brotli is not None:
+                outputs.append(('.br', brotli.compress(data, quality=11)))
+            for ext, blob in outputs:
+                if len(blob) < len(data):
+                    with open(path + ext, 'wb') as f:
+                        f.write(blob)
+                    written.append(path + ext)
+    return written
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""Bytes on the wire and CPU per request for large cast pages, by Accept-Encoding.
+
+Each run happens in a fresh interpreter against a new scratch database
+holding one production with --cast students in --roles roles (imported
+through the archive format so any checkout can load the same data). Each
+page is then requested --requests times per Accept-Encoding header through
+the Flask test client:
+
+    /view/production/<id>/cast   director cast page, rendered every time
+    /viewer/production/<id>      audience program, served from the page cache
+
+The report has the median response bytes and CPU milliseconds
+(time.process_time) per request. A checkout without compression answers
+every header with the uncompressed page.
+
+    python bench/compression.py                      # this checkout
+    python bench/compression.py --repo /tmp/before   # another checkout, for before/after
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROBE = r'''
+import json, statistics, sys, time
+from app import app, db
+from archive import FORMAT, VERSION, TABLES, import_production
+from migrations import init_db
+
+opts = json.loads(sys.argv[1])
+
+def table(name, rows):
+    return {'columns': list(TABLES[name]), 'rows': rows}
+
+with app.app_context():
+    init_db()
+    roles, cast = opts['roles'], opts['cast']
+    names = [f'Student {i:05d}' for i in range(cast)]
+    pid, _ = import_production({
+        'format': FORMAT, 'version': VERSION,
+        'production': {'title': 'The Big Show', 'subtitle': 'Everyone is in it'},
+        'students': table('students', [[n, '', ''] for n in names]),
+        'roles': table('roles', [[f'Role {r}', r >= roles * 7 // 10, 0] for r in range(roles)]),
+        'role_assignments': table('role_assignments', [[i % roles, i] for i in range(cast)]),
+        'crew': table('crew', [[i, 'Crew'] for i in range(0, cast, 10)]),
+        'team': table('team', [[f'Teacher {i}', 'Director', None] for i in range(10)]),
+        'songs': table('songs', [[1 + s * 2 // 40, f'Song {s}', 0, f'Role {s % roles}'] for s in range(40)]),
+        'thanks': table('thanks', [[f'Sponsor {i}'] for i in range(50)]),
+    })
+    db.session.commit()
+client = app.test_client()
+report = {}
+for label, url in (('cast', f'/view/production/{pid}/cast'), ('viewer', f'/viewer/production/{pid}')):
+    for encoding in ('identity', 'gzip', 'br'):
+        headers = {'Accept-Encoding': encoding}
+        for _ in range(3):
+            client.get(url, headers=headers)
+        sizes, cpu = [], []
+        for _ in range(opts['requests']):
+            t = time.process_time()
+            resp = client.get(url, headers=headers)
+            cpu.append(time.process_time() - t)
+            sizes.append(len(resp.data))
+        report[f'{label}:{encoding}'] = {
+            'bytes': int(statistics.median(sizes)),
+            'cpu_ms': round(statistics.median(cpu) * 1000, 3),
+            'encoding': resp.headers.get('Content-Encoding', 'identity'),
+        }
+print(json.dumps(report))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repo', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument('--cast', type=int, default=600, help='Students in the production.')
+    parser.add_argument('--roles', type=int, default=150)
+    parser.add_argument('--requests', type=int, default=50, help='Measured requests per page and encoding.')
+    parser.add_argument('--output', '-o', help='Also write the JSON report here.')
+    args = parser.parse_args()
+    opts = {'cast': args.cast, 'roles': args.roles, 'requests': args.requests}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(tmp, "compression.db")}',
+                   PROGRAM_FOLDER=os.path.join(tmp, 'programs'))
+        out = subprocess.run([sys.executable, '-c', PROBE, json.dumps(opts)], cwd=os.path.abspath(args.repo),
+                             env=env, capture_output=True, text=True, check=True)
+    report = {'repo': os.path.abspath(args.repo), 'options': opts,
+              'pages': json.loads(out.stdout.strip().splitlines()[-1])}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
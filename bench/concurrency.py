@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Concurrent read/write load test against a scratch SQLite database.
+
+Like gunicorn, several forked worker processes share one database file; in
+each, reader threads fetch the program and director pages while writer
+threads add thanks lines to the same production. Each SQLite profile runs in
+its own interpreter (the profile is read at app creation) with the page cache
+disabled so every read reaches the database.
+
+    python bench/concurrency.py                       # default vs tuned
+    python bench/concurrency.py --processes 8 --seconds 10
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000, 2)
+
+
+def child(args):
+    sys.path.insert(0, ROOT)
+    from app import app, db
+    from migrations import init_db
+    from seed_mermaid import seed_mermaid
+    with app.app_context():
+        init_db()
+        seed_mermaid(app, db)
+
+    with app.app_context():
+        db.engine.dispose()  # don't share the parent's connections with forked workers
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    workers = [ctx.Process(target=worker, args=(app, db, args, queue, n)) for n in range(args.processes)]
+    for w in workers:
+        w.start()
+    results = [queue.get() for _ in workers]
+    for w in workers:
+        w.join()
+
+    reads = [x for r in results for x in r['read']]
+    writes = [x for r in results for x in r['write']]
+    print(json.dumps({
+        'profile': os.environ['SQLITE_PROFILE'],
+        'reads': len(reads),
+        'writes': len(writes),
+        'reads_per_s': round(len(reads) / args.seconds, 1),
+        'writes_per_s': round(len(writes) / args.seconds, 1),
+        'read_p95_ms': percentile(reads, 95),
+        'write_p95_ms': percentile(writes, 95),
+        'lock_errors': sum(r['locked'] for r in results),
+        'other_errors': sum(r['other'] for r in results),
+    }))
+
+
+def worker(app, db, args, queue, n):
+    from flask import got_request_exception
+    errors = {'locked': 0, 'other': 0}
+    lock = threading.Lock()
+
+    def on_exception(sender, exception, **extra):
+        with lock:
+            errors['locked' if 'database is locked' in str(exception) else 'other'] += 1
+    got_request_exception.connect(on_exception, app)
+
+    latencies = {'read': [], 'write': []}
+    stop = time.monotonic() + args.seconds
+
+    def reader():
+        client = app.test_client()
+        urls = ['/viewer/production/1', '/view/production/1']
+        i = 0
+        while time.monotonic() < stop:
+            t = time.perf_counter()
+            client.get(urls[i % 2])
+            latencies['read'].append(time.perf_counter() - t)
+            i += 1
+
+    def writer(w):
+        client = app.test_client()
+        i = 0
+        while time.monotonic() < stop:
+            t = time.perf_counter()
+            client.post('/edit/production/1/thanks', data={'text': f'load test {n}-{w}-{i}'})
+            latencies['write'].append(time.perf_counter() - t)
+            i += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(w,)) for w in range(args.writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue.put({**latencies, **errors})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2, help='reader threads per process')
+    parser.add_argument('--writers', type=int, default=1, help='writer threads per process')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--profiles', default='default,tuned')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    results = []
+    for profile in args.profiles.split(','):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, SQLITE_PROFILE=profile, PAGE_CACHE_BACKEND='none',
+                       SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(tmp, "bench.db")}',
+                       GUNICORN_THREADS=str(args.readers + args.writers))
+            cmd = [sys.executable, __file__, '--child', '--processes', str(args.processes),
+                   '--readers', str(args.readers),
+                   '--writers', str(args.writers), '--seconds', str(args.seconds)]
+            out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""Time deleting large productions through POST /edit/production/<id>/delete.
+
+Each run happens in a fresh interpreter against a new scratch database
+holding --productions synthetic productions (cast, groups, songs linked to
+roles, crew, team, thanks), imported through the archive format so any
+checkout can load the same data. Every production is then deleted through
+the route, one request each; the report has the median time and SQL
+statements per delete and the rows removed.
+
+    python bench/delete.py                      # this checkout
+    python bench/delete.py --repo /tmp/before   # another checkout, for before/after
+    python bench/delete.py --cast 5000 --roles 800 --songs 400 -o after.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = r'''
+import json, sys, time
+from sqlalchemy import func, select
+from app import app, db
+from archive import FORMAT, VERSION, TABLES, import_production
+from migrations import init_db
+from models import Production
+from snapshot import QueryCounter
+
+opts = json.loads(sys.argv[1])
+
+def table(name, rows):
+    return {'columns': list(TABLES[name]), 'rows': rows}
+
+def child_rows():
+    names = [t for t in db.metadata.tables if t not in ('productions', 'students', 'schema_version')]
+    return sum(db.session.execute(select(func.count()).select_from(db.metadata.tables[t])).scalar() for t in names)
+
+with app.app_context():
+    init_db()
+    roles, cast = opts['roles'], opts['cast']
+    solo = roles * 7 // 10
+    for p in range(opts['productions']):
+        names = [f'Student {p:02d}-{i:05d}' for i in range(cast)]
+        role_rows = [[f'Role {r}', r >= solo, 0] for r in range(roles)]
+        assignments = [[i % roles, i] for i in range(cast)]
+        assignments += [[solo + i % (roles - solo), i] for i in range(0, cast, 2)]  # many in a group as well
+        songs = [[1 + s * 2 // opts['songs'], f'Song {s}', 0, ', '.join(f'Role {(s + k) % roles}' for k in range(4))]
+                 for s in range(opts['songs'])]
+        import_production({
+            'format': FORMAT, 'version': VERSION, 'production': {'title': f'Season production {p}'},
+            'students': table('students', [[n, '', ''] for n in names]),
+            'roles': table('roles', role_rows),
+            'role_assignments': table('role_assignments', assignments),
+            'crew': table('crew', [[i, 'Crew'] for i in range(0, cast, 10)]),
+            'team': table('team', [[f'Teacher {i}', 'Director', None] for i in range(10)]),
+            'songs': table('songs', songs),
+            'thanks': table('thanks', [[f'Sponsor {i}'] for i in range(50)]),
+        })
+    db.session.commit()
+    ids = db.session.execute(select(Production.id)).scalars().all()
+    rows = child_rows()
+    engine = db.engine
+client = app.test_client()
+samples = []
+for pid in ids:
+    with QueryCounter(engine) as counter:
+        t0 = time.perf_counter()
+        resp = client.post(f'/edit/production/{pid}/delete')
+        elapsed = time.perf_counter() - t0
+    assert resp.status_code == 302, resp.status_code
+    samples.append({'seconds': elapsed, 'statements': counter.count})
+with app.app_context():
+    left = child_rows()
+print(json.dumps({'samples': samples, 'rows': rows, 'rows_left': left}))
+'''
+
+
+def run(repo, opts, runs):
+    results = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(tmp, "delete.db")}')
+            out = subprocess.run([sys.executable, '-c', PROBE, json.dumps(opts)], cwd=repo, env=env,
+                                 capture_output=True, text=True, check=True)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    samples = [s for r in results for s in r['samples']]
+    return {
+        'repo': repo,
+        'options': opts,
+        'child_rows_per_production': results[0]['rows'] // opts['productions'],
+        'rows_left_after_delete': results[0]['rows_left'],
+        'delete_ms_median': round(statistics.median(s['seconds'] for s in samples) * 1000, 1),
+        'delete_ms_max': round(max(s['seconds'] for s in samples) * 1000, 1),
+        'statements_per_delete': statistics.median(s['statements'] for s in samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repo', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument('--productions', type=int, default=3)
+    parser.add_argument('--cast', type=int, default=3000, help='Students per production.')
+    parser.add_argument('--roles', type=int, default=500)
+    parser.add_argument('--songs', type=int, default=300)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--output', '-o', help='Also write the JSON report here.')
+    args = parser.parse_args()
+    opts = {'productions': args.productions, 'cast': args.cast, 'roles': args.roles, 'songs': args.songs}
+    report = run(os.path.abspath(args.repo), opts, args.runs)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
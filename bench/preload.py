@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""Per-worker memory and cold-start latency of a gunicorn deployment.
+
+Starts `gunicorn app:app --workers N` in --repo against a scratch seeded
+database, so a checkout's gunicorn.conf.py applies. GUNICORN_PRELOAD is
+passed through, so one checkout can also be compared with itself. Reports:
+
+    boot_seconds        launch until the first page is answered
+    first_requests_ms   median / max of the first few requests per worker,
+                        made one at a time right after boot (cold workers)
+    steady_ms           median once every page has been served a few times
+    worker_memory_kb    median RSS, PSS and USS (private) per worker after
+                        the traffic, from /proc/<pid>/smaps_rollup (Linux)
+    total_pss_kb        master + workers: what the deployment really costs
+
+    python bench/preload.py                              # this checkout, preload on
+    python bench/preload.py --preload 0                  # this checkout, preload off
+    python bench/preload.py --repo /tmp/before --workers 4 -o before.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['/viewer', '/viewer/production/1', '/director', '/view/production/1', '/view/production/1/cast']
+
+
+def get(port, path):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        conn.request('GET', path)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status
+    finally:
+        conn.close()
+
+
+def memory(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return {'rss': values['Rss'], 'pss': values['Pss'],
+            'uss': values['Private_Clean'] + values['Private_Dirty']}
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(p) for p in f.read().split()]
+
+
+def run(args, env):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(args.workers),
+                             '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'], cwd=args.repo, env=env)
+    try:
+        while True:
+            try:
+                if get(port, PAGES[0]) == 200:
+                    break
+            except OSError:
+                if time.perf_counter() - started > 60:
+                    raise SystemExit('gunicorn did not start')
+                time.sleep(0.02)
+        boot = time.perf_counter() - started
+        first = []
+        for i in range(args.workers * len(PAGES)):
+            t = time.perf_counter()
+            get(port, PAGES[i % len(PAGES)])
+            first.append(time.perf_counter() - t)
+        for i in range(args.requests):
+            get(port, PAGES[i % len(PAGES)])
+        steady = []
+        for i in range(args.workers * len(PAGES)):
+            t = time.perf_counter()
+            get(port, PAGES[i % len(PAGES)])
+            steady.append(time.perf_counter() - t)
+        workers = [memory(pid) for pid in children(proc.pid)]
+        master = memory(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        'boot_seconds': round(boot, 3),
+        'first_requests_ms': {'median': round(statistics.median(first) * 1000, 1),
+                              'max': round(max(first) * 1000, 1)},
+        'steady_ms': round(statistics.median(steady) * 1000, 1),
+        'worker_memory_kb': {k: int(statistics.median(w[k] for w in workers)) for k in ('rss', 'pss', 'uss')},
+        'total_pss_kb': master['pss'] + sum(w['pss'] for w in workers),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repo', default=ROOT)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--preload', default='1', help='GUNICORN_PRELOAD for the server')
+    parser.add_argument('--requests', type=int, default=200, help='requests between the cold and steady samples')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--output', '-o', help='Also write the JSON report here.')
+    args = parser.parse_args()
+    args.repo = os.path.abspath(args.repo)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(tmp, "preload.db")}',
+                   PROGRAM_FOLDER=os.path.join(tmp, 'programs'), GUNICORN_PRELOAD=args.preload)
+        for command in ('init-db', 'seed'):
+            subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', command], cwd=args.repo, env=env,
+                           check=True, capture_output=True)
+        runs = [run(args, env) for _ in range(args.runs)]
+
+    def median(key, sub=None):
+        values = [r[key][sub] if sub else r[key] for r in runs]
+        return type(values[0])(statistics.median(values))
+
+    report = {
+        'repo': args.repo,
+        'workers': args.workers,
+        'preload': args.preload,
+        'boot_seconds': median('boot_seconds'),
+        'first_requests_ms': {k: median('first_requests_ms', k) for k in ('median', 'max')},
+        'steady_ms': median('steady_ms'),
+        'worker_memory_kb': {k: median('worker_memory_kb', k) for k in ('rss', 'pss', 'uss')},
+        'total_pss_kb': median('total_pss_kb'),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""Time program PDF generation for a production with a 200-member cast.
+
+Builds a scratch database with one large production (200 students across
+solo and ensemble roles, two acts of songs, crew, team, thanks), then times:
+the first download (render on the worker pool), repeat downloads (served
+from the stored PDF), a download after an edit that does not change the
+printed content (revision moves, hash does not) and one after an edit that
+does (re-render).
+
+    python bench/program.py
+    python bench/program.py --cast 400 --repeat 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build(db, models, cast_size):
+    prod = models.Production(title='Les Misérables', subtitle='School Edition', location='Main Auditorium',
+                             price='$12', dates_text='March 6–8, 7:00 PM', copyright='Licensed by MTI')
+    db.session.add(prod)
+    db.session.flush()
+    students = [models.Student(name=f'Student {i:03d} Example') for i in range(cast_size)]
+    db.session.add_all(students)
+    db.session.flush()
+    roles = []
+    for i, student in enumerate(students):
+        if i < 40:
+            role = models.Role(production_id=prod.id, name=f'Principal {i}', is_group=False)
+        else:
+            if (i - 40) % 40 == 0:
+                roles.append(models.Role(production_id=prod.id, name=f'Ensemble {(i - 40) // 40 + 1}', is_group=True))
+                db.session.add(roles[-1])
+                db.session.flush()
+            role = None
+        if role is not None:
+            db.session.add(role)
+            db.session.flush()
+        db.session.add(models.RoleAssignment(role_id=(role or roles[-1]).id, student_id=student.id))
+    for i in range(30):
+        db.session.add(models.Song(production_id=prod.id, act=1 + i // 16, title=f'Number {i}',
+                                   performers_text='Company'))
+    for i in range(30):
+        db.session.add(models.CrewAssignment(production_id=prod.id, student_id=students[i].id,
+                                             responsibility='Stage Crew'))
+    for i in range(8):
+        db.session.add(models.TeamMember(production_id=prod.id, name=f'Teacher {i}', position=f'Position {i}'))
+    for i in range(20):
+        db.session.add(models.Thanks(production_id=prod.id, text=f'Sponsor number {i}'))
+    db.session.commit()
+    return prod.id
+
+
+def timed(client, url):
+    t = time.perf_counter()
+    resp = client.get(url)
+    return time.perf_counter() - t, resp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cast', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(tmp, "bench.db")}',
+                      PROGRAM_FOLDER=os.path.join(tmp, 'programs'), PROGRAM_WAIT='120')
+    sys.path.insert(0, ROOT)
+    from app import app, db
+    import models
+    from migrations import init_db
+    with app.app_context():
+        init_db()
+        pid = build(db, models, args.cast)
+
+    client = app.test_client()
+    url = f'/viewer/production/{pid}/program.pdf'
+    first, resp = timed(client, url)
+    assert resp.status_code == 200, resp.status_code
+    size = len(resp.data)
+    warm = [timed(client, url)[0] for _ in range(args.repeat)]
+
+    client.post(f'/edit/production/{pid}/thanks', data={'text': 'Sponsor number 0'})  # adds a line: re-render
+    changed, _ = timed(client, url)
+    with app.app_context():  # revision bump only, printed content unchanged
+        db.session.execute(db.update(models.Production).where(models.Production.id == pid)
+                           .values(revision=models.Production.revision + 1))
+        db.session.commit()
+    unchanged, _ = timed(client, url)
+
+    print(json.dumps({
+        'cast': args.cast,
+        'pdf_bytes': size,
+        'first_download_ms': round(first * 1000, 1),
+        'cached_download_median_ms': round(statistics.median(warm) * 1000, 2),
+        'after_content_edit_ms': round(changed * 1000, 1),
+        'after_revision_only_ms': round(unchanged * 1000, 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
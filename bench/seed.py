@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Time `seed_mermaid` (and count its SQL statements) on a fresh database.
+
+Each run happens in a fresh interpreter against a new scratch database that
+has the schema but no data, so the seed does all of its work.
+
+    python bench/seed.py                      # this checkout
+    python bench/seed.py --repo /tmp/before   # another checkout, for before/after
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = r'''
+import json, time
+from app import app, db
+from migrations import init_db
+from seed_mermaid import seed_mermaid
+from snapshot import QueryCounter
+with app.app_context():
+    init_db()
+    engine = db.engine
+with QueryCounter(engine) as counter:
+    t0 = time.perf_counter()
+    seed_mermaid(app, db)
+    elapsed = time.perf_counter() - t0
+print(json.dumps({"seconds": elapsed, "statements": counter.count}))
+'''
+
+
+def run(repo, runs):
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(tmp, "seed.db")}')
+            out = subprocess.run([sys.executable, '-c', PROBE], cwd=repo, env=env,
+                                 capture_output=True, text=True, check=True)
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        'repo': repo,
+        'seed_ms': round(statistics.median(s['seconds'] for s in samples) * 1000, 1),
+        'statements': samples[0]['statements'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repo', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(run(os.path.abspath(args.repo), args.runs), indent=2))
+
+
+if __name__ == '__main__':
+    main()
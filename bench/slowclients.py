@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""Slow clients against sync gunicorn and the ASGI viewer (asgi.py), side by side.
+
+Both servers run on a scratch seeded database. During each run, --slow
+clients each trickle a request for a viewer page over --trickle seconds,
+read the answer in small pieces and start again, like phones on weak
+Wi-Fi, while --fast clients fetch viewer pages as quickly as they are
+answered, both for --duration seconds. The report has, per server:
+
+    slow_held       average slow connections open at once (answered ones only;
+                    for gunicorn most of them wait in the kernel's listen backlog)
+    slow_pages      pages the slow clients got, and failures (timeouts, resets)
+    slow_seconds    median / max time for a slow client to get its page
+    fast_rps        pages per second served to the fast clients meanwhile
+    fast_ms         p50 / p95 latency of those pages, plus failures
+
+    python bench/slowclients.py
+    python bench/slowclients.py --workers 4 --slow 100 --fast 8 -o slow.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start(server, args, env):
+    port = free_port()
+    if server == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(args.workers),
+               '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', str(port),
+               '--log-level', 'warning', '--backlog', '2048']
+    proc = subprocess.Popen(cmd, cwd=args.repo, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit(f'{server} did not start')
+
+
+def request(path):
+    return f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode()
+
+
+async def fetch(port, path, trickle=0.0, timeout=30.0):
+    """One request; returns (status, seconds). With trickle, send and read slowly."""
+    started = time.perf_counter()
+
+    async def go():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            data = request(path)
+            if trickle:
+                pieces = 10
+                step = -(-len(data) // pieces)
+                for i in range(0, len(data), step):
+                    writer.write(data[i:i + step])
+                    await writer.drain()
+                    await asyncio.sleep(trickle / pieces)
+            else:
+                writer.write(data)
+            status_line = await reader.readline()
+            while True:
+                chunk = await reader.read(512)
+                if not chunk:
+                    break
+                if trickle:
+                    await asyncio.sleep(0.01)
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+    try:
+        status = await asyncio.wait_for(go(), timeout)
+    except (asyncio.TimeoutError, OSError, IndexError, ValueError):
+        status = None
+    return status, time.perf_counter() - started
+
+
+async def load(port, args, paths):
+    stop = time.monotonic() + args.duration
+    slow, fast = [], []
+
+    async def client(n, results, trickle, timeout):
+        i = n
+        while time.monotonic() < stop:
+            results.append(await fetch(port, paths[i % len(paths)], trickle=trickle, timeout=timeout))
+            i += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n, slow, args.trickle, 30) for n in range(args.slow)),
+                         *(client(n, fast, 0, 10) for n in range(args.fast)))
+    return slow, fast, time.perf_counter() - started
+
+
+def summarize(slow, fast, elapsed, args):
+    ok = sorted(s for status, s in fast if status == 200)
+    slow_ok = [s for status, s in slow if status == 200]
+
+    def pct(values, p):
+        return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1000, 1) if values else None
+
+    return {
+        # Little's law: the average number of slow connections the server had open
+        'slow_held': round(sum(slow_ok) / elapsed, 1),
+        'slow_pages': len(slow_ok),
+        'slow_failed': len(slow) - len(slow_ok),
+        'slow_seconds': {'median': round(statistics.median(slow_ok), 2) if slow_ok else None,
+                         'max': round(max(slow_ok), 2) if slow_ok else None},
+        'fast_rps': round(len(ok) / elapsed, 1),
+        'fast_ms': {'p50': pct(ok, 50), 'p95': pct(ok, 95)},
+        'fast_failed': len(fast) - len(ok),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repo', default=ROOT)
+    parser.add_argument('--servers', default='gunicorn,asgi')
+    parser.add_argument('--workers', type=int, default=2, help='sync gunicorn workers')
+    parser.add_argument('--slow', type=int, default=50, help='slow clients')
+    parser.add_argument('--trickle', type=float, default=3.0, help='seconds each slow client takes to send')
+    parser.add_argument('--fast', type=int, default=4, help='fast clients')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--output', '-o', help='Also write the JSON report here.')
+    args = parser.parse_args()
+    args.repo = os.path.abspath(args.repo)
+
+    report = {'options': {k: v for k, v in vars(args).items() if k not in ('output', 'servers')}}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(tmp, "slow.db")}',
+                   PROGRAM_FOLDER=os.path.join(tmp, 'programs'))
+        for command in ('init-db', 'seed'):
+            subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', command], cwd=args.repo, env=env,
+                           check=True, capture_output=True)
+        paths = ['/viewer/production/1', '/viewer']
+        for server in args.servers.split(','):
+            proc, port = start(server, args, env)
+            try:
+                asyncio.run(load(port, argparse.Namespace(**{**vars(args), 'slow': 0, 'duration': 1}), paths))
+                report[server] = summarize(*asyncio.run(load(port, args, paths)), args)
+            finally:
+                proc.terminate()
+                proc.wait()
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
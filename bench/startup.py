@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Measure worker boot cost and per-request overhead of startup work.
+
+Reports the time to create the app (library imports excluded), to serve the first viewer requests, and
+the median of repeated director page requests (which are never page-cached).
+
+Each run happens in a fresh interpreter against an already-initialised copy
+of the database, which is what a gunicorn worker sees on boot.
+
+    python bench/startup.py                      # this checkout
+    python bench/startup.py --repo /tmp/before   # another checkout, for before/after
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import json, time
+import flask, flask_sqlalchemy, sqlalchemy  # library import cost is the same before and after
+t0 = time.perf_counter()
+from app import app
+t1 = time.perf_counter()
+client = app.test_client()
+for url in ("/viewer", "/viewer/production/1"):
+    client.get(url)
+t2 = time.perf_counter()
+steady = []
+for _ in range(50):
+    t = time.perf_counter()
+    client.get("/view/production/1")
+    steady.append(time.perf_counter() - t)
+steady.sort()
+print(json.dumps({"import": t1 - t0, "first_requests": t2 - t1, "steady_request": steady[len(steady) // 2]}))
+'''
+
+
+def run(repo, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE], cwd=repo, capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        key: {
+            'median_ms': round(statistics.median(s[key] for s in samples) * 1000, 1),
+            'min_ms': round(min(s[key] for s in samples) * 1000, 1),
+        }
+        for key in ('import', 'first_requests', 'steady_request')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repo', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps({'repo': args.repo, 'runs': args.runs, **run(args.repo, args.runs)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
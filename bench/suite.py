@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+"""Route benchmark suite: synthetic database, test client or gunicorn, JSON results.
+
+Builds a scratch database of the requested size (productions, students,
+roles/songs per production, generated from a fixed random seed so runs are
+comparable), then drives each scenario and reports throughput, p50/p95/p99
+latency and SQL statements per request (read from the Server-Timing header,
+so it works against gunicorn too). The page cache is off by default so the
+numbers reflect rendering and database work; pass --page-cache memory to
+measure what visitors see.
+
+    python bench/suite.py                                   # Flask test client
+    python bench/suite.py --server gunicorn --workers 2 --threads 4 --concurrency 8
+    python bench/suite.py --productions 50 --students 5000 --roles 60 -o after.json
+    python bench/suite.py --compare before.json after.json
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERIES = re.compile(r'desc="(\d+) queries"')
+FIRST = ['Ava', 'Ben', 'Cora', 'Dev', 'Eli', 'Fay', 'Gus', 'Hana', 'Ivy', 'Jude', 'Kai', 'Lena']
+LAST = ['Kim', 'Lopez', 'Nguyen', 'Olsen', 'Patel', 'Quinn', 'Rossi', 'Sato', 'Tran', 'Weber']
+
+
+# -- synthetic data ---------------------------------------------------------
+
+def build_database(args):
+    """Fill the (empty) configured database; returns (production ids, student ids)."""
+    from app import app, db
+    from archive import FORMAT, VERSION, TABLES, import_production
+    from importer import insert_ignoring_duplicates
+    from migrations import init_db
+    from models import Student
+
+    rng = random.Random(args.seed)
+    names = [f'{rng.choice(FIRST)} {rng.choice(LAST)} {i:05d}' for i in range(args.students)]
+
+    def table(name, rows):
+        return {'columns': list(TABLES[name]), 'rows': rows}
+
+    with app.app_context():
+        init_db()
+        for start in range(0, len(names), 1000):
+            db.session.execute(insert_ignoring_duplicates(),
+                               [{'name': n, 'sex': '', 'year': ''} for n in names[start:start + 1000]])
+        production_ids = []
+        for p in range(args.productions):
+            cast = rng.sample(names, min(len(names), args.cast))
+            # 70% solo roles with one student each, the rest of the cast spread over group roles
+            solo = max(1, int(args.roles * 0.7))
+            groups = args.roles - solo
+            roles = [[f'Role {r}', r >= solo, 0] for r in range(args.roles)]
+            assignments = [[i if i < solo else (solo + i % groups if groups else i % solo), i]
+                           for i in range(len(cast))]
+            archive = {
+                'format': FORMAT, 'version': VERSION,
+                'production': {'title': f'Production {p:03d}', 'subtitle': 'Benchmark', 'location': 'Auditorium',
+                               'price': '$10', 'dates_text': 'Fri, Sat', 'notes': 'Synthetic data'},
+                'students': table('students', [[n, '', ''] for n in cast]),
+                'roles': table('roles', roles),
+                'role_assignments': table('role_assignments', assignments),
+                'crew': table('crew', [[i, 'Stage Crew'] for i in range(min(10, len(cast)))]),
+                'team': table('team', [[f'Teacher {i}', f'Position {i}', None] for i in range(6)]),
+                'songs': table('songs', [[1 + s * 2 // max(1, args.songs), f'Song {s}', 0, 'Company']
+                                         for s in range(args.songs)]),
+                'thanks': table('thanks', [[f'Sponsor {i}'] for i in range(5)]),
+            }
+            production_ids.append(import_production(archive)[0])
+        db.session.commit()
+        student_ids = db.session.execute(db.select(Student.id)).scalars().all()
+        db.engine.dispose()
+    return production_ids, student_ids
+
+
+# -- scenarios --------------------------------------------------------------
+
+def scenarios(production_ids, student_ids, import_rows):
+    unique = itertools.count()
+
+    def form(**fields):
+        return urlencode(fields).encode(), 'application/x-www-form-urlencoded'
+
+    def roster():
+        rows = ['name'] + [f'Imported Student {next(unique):07d}' for _ in range(import_rows)]
+        return '\n'.join(rows).encode(), 'text/csv'
+
+    return {
+        'viewer_home': lambda rng: ('GET', '/viewer', None, None),
+        'viewer_production': lambda rng: ('GET', f'/viewer/production/{rng.choice(production_ids)}', None, None),
+        'view_cast': lambda rng: ('GET', f'/view/production/{rng.choice(production_ids)}/cast', None, None),
+        'import_students': lambda rng: ('POST', '/edit/import_students', *roster()),
+        'edit_thanks': lambda rng: ('POST', f'/edit/production/{rng.choice(production_ids)}/thanks',
+                                    *form(text=f'Bench thanks {next(unique)}')),
+        'edit_song': lambda rng: ('POST', f'/edit/production/{rng.choice(production_ids)}/songs',
+                                  *form(title=f'Bench song {next(unique)}', act=rng.choice((1, 2)),
+                                        performers='Company')),
+        'edit_cast': lambda rng: ('POST', f'/edit/production/{rng.choice(production_ids)}/cast',
+                                  *form(student_id=rng.choice(student_ids), role=f'Bench role {next(unique)}')),
+    }
+
+
+# -- transports -------------------------------------------------------------
+
+def client_sender():
+    from app import app
+    local = threading.local()
+
+    def send(method, path, body, content_type):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        resp = client.open(path, method=method, data=body, content_type=content_type)
+        resp.close()
+        return resp.status_code, resp.headers.get('Server-Timing', '')
+    return send
+
+
+def http_sender(port):
+    def send(method, path, body, content_type):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        try:
+            conn.request(method, path, body=body, headers={'Content-Type': content_type} if content_type else {})
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status, resp.getheader('Server-Timing', '')
+        finally:
+            conn.close()
+    return send
+
+
+def start_gunicorn(args, env):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                             '--workers', str(args.workers), '--threads', str(args.threads), '--log-level', 'warning'],
+                            cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            http_sender(port)('GET', '/', None, None)
+            return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit('gunicorn did not start')
+
+
+# -- measurement ------------------------------------------------------------
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))] * 1000, 2)
+
+
+def run_scenario(send, make_request, args, seed):
+    rng = random.Random(seed)
+    for _ in range(args.warmup):
+        send(*make_request(rng))
+    remaining = itertools.count()
+    lock = threading.Lock()
+    latencies, queries, errors = [], [], 0
+
+    def worker(n):
+        nonlocal errors
+        wrng = random.Random(seed * 1000 + n)
+        while next(remaining) < args.requests:
+            request = make_request(wrng)
+            t = time.perf_counter()
+            status, timing = send(*request)
+            elapsed = time.perf_counter() - t
+            match = QUERIES.search(timing)
+            with lock:
+                latencies.append(elapsed)
+                if match:
+                    queries.append(int(match.group(1)))
+                if status >= 400:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(a, b):
+        return f'{(b - a) / a:+.0%}' if a and b is not None else 'n/a'
+
+    print(f'{"scenario":<20}{"rps":>18}{"p50 ms":>22}{"p95 ms":>22}{"queries":>14}')
+    for name, b in after['scenarios'].items():
+        a = before['scenarios'].get(name)
+        if a is None:
+            continue
+        print(f'{name:<20}'
+              f'{a["throughput_rps"]:>7} → {b["throughput_rps"]:<6}{change(a["throughput_rps"], b["throughput_rps"]):>5}'
+              f'{a["p50_ms"]:>9} → {b["p50_ms"]:<7}{change(a["p50_ms"], b["p50_ms"]):>5}'
+              f'{a["p95_ms"]:>9} → {b["p95_ms"]:<7}{change(a["p95_ms"], b["p95_ms"]):>5}'
+              f'{str(a["queries_mean"]):>7} → {b["queries_mean"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--productions', type=int, default=20)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--cast', type=int, default=60, help='students cast per production')
+    parser.add_argument('--roles', type=int, default=30, help='roles per production')
+    parser.add_argument('--songs', type=int, default=24, help='songs per production')
+    parser.add_argument('--import-rows', type=int, default=200, help='CSV rows per import_students request')
+    parser.add_argument('--scenarios', help='comma-separated subset (default: all)')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads')
+    parser.add_argument('--server', choices=('client', 'gunicorn'), default='client')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--page-cache', default='none', help='PAGE_CACHE_BACKEND for the app')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', '-o', help='also write the JSON report here')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='diff two reports and exit')
+    args = parser.parse_args()
+    if args.compare:
+        return compare(*args.compare)
+
+    tmp = tempfile.mkdtemp(prefix='musical-bench-')
+    env = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+           'PAGE_CACHE_BACKEND': args.page_cache, 'PROGRAM_FOLDER': os.path.join(tmp, 'programs'),
+           'SLOW_REQUEST_MS': '100000', 'GUNICORN_THREADS': str(args.threads)}
+    os.environ.update(env)
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    production_ids, student_ids = build_database(args)
+    build_seconds = time.perf_counter() - started
+
+    proc = None
+    if args.server == 'gunicorn':
+        proc, port = start_gunicorn(args, dict(os.environ))
+        send = http_sender(port)
+    else:
+        send = client_sender()
+    try:
+        available = scenarios(production_ids, student_ids, args.import_rows)
+        selected = args.scenarios.split(',') if args.scenarios else list(available)
+        results = {name: run_scenario(send, available[name], args, args.seed + i)
+                   for i, name in enumerate(selected)}
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'server': args.server,
+            'workers': args.workers if args.server == 'gunicorn' else None,
+            'threads': args.threads if args.server == 'gunicorn' else None,
+            'concurrency': args.concurrency,
+            'page_cache': args.page_cache,
+            'data': {'productions': args.productions, 'students': args.students, 'cast': args.cast,
+                     'roles': args.roles, 'songs': args.songs, 'seed': args.seed},
+            'build_seconds': round(build_seconds, 2),
+        },
+        'scenarios': results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+# cache.py
+"""Rendered-page cache for the public viewer routes.
+
+Pages are stored under keys built from the production id (plus one key for the
+viewer list) and dropped by the edit routes through `page_cache.invalidate`.
+Two backends are available:
+
+- ``memory``: per-process LRU dict with TTL (default, fastest)
+- ``file``: one file per entry in a shared directory, so every gunicorn worker
+  sees the same entries and the same invalidations
+
+Entries also hold the page's gzip/brotli bodies, compressed on first use
+(see compression.py), and the ETag the page was rendered for. The memory
+backend is per process, so an edit handled by one gunicorn worker cannot
+drop the other workers' copies; a lookup with an ETag that differs from the
+stored one is therefore a miss. `conditional_page` adds weak ETags derived from
+Production.revision so repeat visits are answered with 304 before anything
+is rendered.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+from compression import cached_body, set_encoded
+from database import primary_reads
+
+HOME_KEY = 'viewer:home'
+
+
+def production_key(production_id):
+    return f'viewer:production:{production_id}'
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryBackend:
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileBackend:
+    """Cache shared between processes through files in one directory.
+
+    Writes go through a temp file and os.replace so readers never see a partial
+    entry. Least recently used entries (by mtime, touched on hit) are pruned
+    once the directory holds more than max_entries files.
+    """
+
+    def __init__(self, directory, max_entries=256, ttl=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires, value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires < time.time():
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key, value):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((time.time() + self.ttl, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+        self._prune()
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.cache'):
+                self._remove(entry.path)
+
+    def _prune(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith('.cache')]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for e in entries[:len(entries) - self.max_entries]:
+            self._remove(e.path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PAGE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('PAGE_CACHE_TTL', 300)
+        app.config.setdefault('PAGE_CACHE_MAX_ENTRIES', 256)
+        app.config.setdefault('PAGE_CACHE_DIR', os.path.join(app.instance_path, 'page_cache'))
+        kind = app.config['PAGE_CACHE_BACKEND']
+        ttl = app.config['PAGE_CACHE_TTL']
+        max_entries = app.config['PAGE_CACHE_MAX_ENTRIES']
+        if kind == 'memory':
+            self.backend = MemoryBackend(max_entries, ttl)
+        elif kind == 'file':
+            self.backend = FileBackend(app.config['PAGE_CACHE_DIR'], max_entries, ttl)
+        elif kind in (None, '', 'none'):
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown PAGE_CACHE_BACKEND {kind!r}')
+
+    def get(self, key, etag=None):
+        """The entry under key; with etag, only if it was stored for that ETag."""
+        value = self.backend.get(key)
+        if value is not None and etag is not None and unpack_entry(value)[3] != etag:
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def invalidate(self, production_id=None, listing=False):
+        """Drop the cached page for a production, and the viewer list if it changed too."""
+        if production_id is not None:
+            self.backend.delete(production_key(production_id))
+        if listing:
+            self.backend.delete(HOME_KEY)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+page_cache = PageCache()
+
+
+def unpack_entry(entry):
+    """(body, mimetype, encoded, etag) of a page-cache entry; older entries lack the last two."""
+    return tuple(entry) + ({}, None)[len(entry) - 2:]
+
+
+def page_etag(etag_fn, kwargs):
+    """The ETag conditional_page sends for a view: etag_fn's value mixed with the template fingerprint.
+
+    Computed once per request, so cached_page can check it without querying again.
+    """
+    etag = g.get('_page_etag')
+    if etag is None:
+        etag = g._page_etag = hashlib.sha1(f'{template_fingerprint()}:{etag_fn(**kwargs)}'.encode()).hexdigest()
+    return etag
+
+
+def cached_page(key_fn, renders_flashes=True, etag_fn=None):
+    """Serve the view from page_cache, rendering and storing it on a miss.
+
+    Pages are not cached while the visitor has pending flash messages, since
+    those are rendered into base.jinja (pass renders_flashes=False for JSON).
+    With etag_fn (the same function as the view's conditional_page), an entry
+    stored for another ETag is re-rendered, so a worker whose copy predates
+    an edit made elsewhere never sends it under the new ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if renders_flashes and '_flashes' in session:
+                return view(*args, **kwargs)
+            key = key_fn(**kwargs)
+            etag = page_etag(etag_fn, kwargs) if etag_fn else None
+            cached = page_cache.get(key, etag)
+            if cached is not None:
+                body, mimetype, encoded, _ = unpack_entry(cached)
+                data, encoding, changed = cached_body(body, mimetype, encoded)
+                if changed:
+                    page_cache.set(key, (body, mimetype, encoded, etag))
+                resp = current_app.response_class(mimetype=mimetype)
+                set_encoded(resp, data, encoding)
+                resp.headers['X-Cache'] = 'HIT'
+                return resp
+            with primary_reads():  # never cache a page rendered from a lagging replica
+                resp = make_response(view(*args, **kwargs))
+            if resp.status_code == 200 and not resp.direct_passthrough:
+                body, encoded = resp.get_data(), {}
+                data, encoding, _ = cached_body(body, resp.mimetype, encoded)
+                page_cache.set(key, (body, resp.mimetype, encoded, etag))
+                set_encoded(resp, data, encoding)
+            resp.headers['X-Cache'] = 'MISS'
+            return resp
+        return wrapper
+    return decorator
+
+
+def conditional_page(etag_fn, renders_flashes=True):
+    """Answer If-None-Match with 304 before the view (or template) runs.
+
+    etag_fn receives the view kwargs and returns a string that changes whenever
+    the rendered page would. The app's template fingerprint is mixed in, so a
+    deploy with changed templates also changes every ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if renders_flashes and '_flashes' in session:
+                return view(*args, **kwargs)
+            etag = page_etag(etag_fn, kwargs)
+            if request.if_none_match.contains_weak(etag):
+                resp = current_app.response_class(status=304)
+            else:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)  # the same page is sent compressed or not
+            resp.headers['Cache-Control'] = 'no-cache'
+            return resp
+        return wrapper
+    return decorator
+
+
+def template_fingerprint():
+    """Hash of every template file, computed once per process."""
+    app = current_app._get_current_object()
+    fingerprint = app.extensions.get('template_fingerprint')
+    if fingerprint is None:
+        digest = hashlib.sha1()
+        folder = os.path.join(app.root_path, app.template_folder)
+        for name in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, name), 'rb') as f:
+                digest.update(name.encode() + f.read())
+        fingerprint = app.extensions['template_fingerprint'] = digest.hexdigest()[:12]
+    return fingerprint
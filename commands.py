@@ -0,0 +1,229 @@
+# commands.py
+"""Flask CLI commands (run with `flask --app app <command>`)."""
+
+import click
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, Production, Role, RoleAssignment
+from snapshot import QueryCounter
+from cache import page_cache
+
+
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(query_plan)
+    app.cli.add_command(process_covers)
+    app.cli.add_command(compress_assets)
+    app.cli.add_command(build_programs)
+    app.cli.add_command(export_productions)
+    app.cli.add_command(import_productions)
+    app.cli.add_command(archive_season)
+    app.cli.add_command(export_site)
+    app.cli.add_command(live_server)
+    app.cli.add_command(sync_replica)
+
+
+@click.command('init-db')
+def init_db_command():
+    """Create the tables and apply schema upgrades (no-op when already current)."""
+    from migrations import init_db, SCHEMA_VERSION
+    if init_db():
+        click.echo(f'Database schema upgraded to version {SCHEMA_VERSION}.')
+    else:
+        click.echo(f'Database schema already at version {SCHEMA_VERSION}.')
+
+
+@click.command('seed')
+def seed_command():
+    """Add The Little Mermaid production if it is missing."""
+    from seed_mermaid import seed_mermaid
+    seed_mermaid(current_app._get_current_object(), db)
+
+
+def _explain(conn, statement, parameters):
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters or ()).all()
+    return [r[-1] for r in rows]
+
+
+@click.command('query-plan')
+@click.option('--production-id', type=int, help='Production to exercise (defaults to the first one).')
+def query_plan(production_id):
+    """Print EXPLAIN QUERY PLAN for every SELECT each page route issues.
+
+    A "SCAN" without an index on a filtered (WHERE) query is flagged with "!!";
+    unfiltered listings of a whole table are expected to scan.
+    """
+    app = current_app._get_current_object()
+    if production_id is None:
+        production_id = db.session.execute(select(Production.id).order_by(Production.id)).scalar()
+    if production_id is None:
+        raise click.ClickException('No productions in the database.')
+
+    urls = ['/viewer', f'/viewer/production/{production_id}', '/director',
+            f'/view/production/{production_id}', f'/view/production/{production_id}/cast',
+            f'/view/production/{production_id}/crew', f'/view/production/{production_id}/songs']
+    client = app.test_client()
+    scans = 0
+    with db.engine.connect() as conn:
+        reports = []
+        for url in urls:
+            page_cache.clear()
+            with QueryCounter(db.engine) as counter:
+                client.get(url)
+            reports.append((url, counter.statements, counter.parameters))
+
+        # the edit routes' lookups, issued without committing anything
+        role = db.session.execute(select(Role).where(Role.production_id == production_id)).scalars().first()
+        with QueryCounter(db.engine) as counter:
+            Role.query.filter_by(production_id=production_id, name=role.name if role else '', is_group=False).first()
+            if role:
+                RoleAssignment.query.filter_by(role_id=role.id, student_id=0).first()
+        reports.append(('POST /edit/production/<id>/cast (lookups)', counter.statements, counter.parameters))
+        db.session.rollback()
+
+        for url, statements, parameters in reports:
+            click.echo(f'== {url}')
+            for statement, params in zip(statements, parameters):
+                if not statement.lstrip().upper().startswith('SELECT'):
+                    continue
+                click.echo('  ' + ' '.join(statement.split())[:120])
+                for line in _explain(conn, statement, params):
+                    full_scan = line.startswith('SCAN') and 'INDEX' not in line and ' WHERE ' in statement
+                    scans += full_scan
+                    click.echo(f"      {'!! ' if full_scan else ''}{line}")
+    click.echo(f'{scans} full table scan(s) on filtered queries')
+
+
+@click.command('process-covers')
+def process_covers():
+    """Generate resized WebP/JPEG variants for every existing cover image."""
+    import os
+    from images import Image, generate_variants
+    from routes import commit_production_change
+    if Image is None:
+        raise click.ClickException('Pillow is not installed.')
+    folder = current_app.config['UPLOAD_FOLDER']
+    covers = db.session.execute(select(Production.id, Production.cover_filename)
+                                .where(Production.cover_filename.is_not(None))).all()
+    for production_id, url in covers:
+        path = os.path.join(folder, url.rsplit('/', 1)[-1])
+        if not os.path.exists(path):
+            click.echo(f'production {production_id}: missing {path}')
+            continue
+        generate_variants(path)
+        commit_production_change(production_id, listing=True)
+        click.echo(f'production {production_id}: variants ready for {url}')
+
+
+@click.command('compress-assets')
+def compress_assets():
+    """Write precompressed .gz/.br siblings for CSS/JS/SVG under static/."""
+    from assets import compress_tree
+    for path in compress_tree(current_app.static_folder):
+        click.echo(path)
+
+
+@click.command('build-programs')
+@click.option('--production-id', type=int, help='Only this production (defaults to all).')
+def build_programs(production_id):
+    """Render program PDFs whose content changed since they were last built."""
+    import program
+    if not program.available():
+        raise click.ClickException('reportlab is not installed.')
+    ids = [production_id] if production_id else db.session.execute(select(Production.id)).scalars().all()
+    for pid in ids:
+        folder, filename, job = program.program_pdf(pid)
+        click.echo(f'{filename}: {"up to date" if job is None else "rendered"}')
+        if job is not None:
+            job.result()
+
+
+@click.command('export-production')
+@click.option('--production-id', type=int, help='Only this production (defaults to all).')
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help='Archive file (JSONL, one production per line); stdout by default.')
+@click.option('--with-cover/--without-cover', default=True, help='Embed the cover image.')
+def export_productions(production_id, output, with_cover):
+    """Write productions as portable archives."""
+    from archive import dump_archive, export_production
+    ids = [production_id] if production_id else db.session.execute(
+        select(Production.id).order_by(Production.id)).scalars().all()
+    for pid in ids:
+        archive = export_production(pid, current_app.config['UPLOAD_FOLDER'] if with_cover else None)
+        if archive is None:
+            raise click.ClickException(f'No production {pid}.')
+        output.write(dump_archive(archive) + '\n')
+
+
+@click.command('import-production')
+@click.argument('archive_file', type=click.File('rb'))
+def import_productions(archive_file):
+    """Create productions from an archive written by export-production."""
+    from archive import ArchiveError, import_production, load_archives
+    try:
+        for archive in load_archives(archive_file):
+            production_id, counts = import_production(archive, current_app.config['UPLOAD_FOLDER'])
+            job = counts.pop('cover_job')
+            db.session.commit()
+            if job is not None:
+                job.result()
+            click.echo(f'{archive["production"]["title"]}: production {production_id} '
+                       f'({counts["students"]} students, {counts["roles"]} roles, '
+                       f'{counts["role_assignments"]} assignments)')
+    except ArchiveError as exc:
+        db.session.rollback()
+        raise click.ClickException(str(exc))
+
+
+@click.command('archive-season')
+@click.option('--production-id', 'production_ids', type=int, multiple=True, required=True,
+              help='Production to archive (repeat for several).')
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), required=True,
+              help='Archive file to write (JSONL); restore it with import-production.')
+def archive_season(production_ids, output):
+    """Export productions to one archive file, then delete them with set-based DELETEs."""
+    from archive import archive_productions
+    from routes import productions_removed
+    archived = archive_productions(production_ids, output, current_app.config['UPLOAD_FOLDER'])
+    output.flush()
+    db.session.commit()
+    productions_removed(archived)  # cached pages, live viewers and the static site, as the route does
+    missing = sorted(set(production_ids) - set(archived))
+    click.echo(f'Archived {len(archived)} production(s)' + (f'; not found: {missing}' if missing else '') + '.')
+
+
+@click.command('export-site')
+@click.option('--full', is_flag=True, help='Re-render every page, not just the changed ones.')
+def export_site(full):
+    """Render the audience pages, PDFs and assets into STATIC_SITE_FOLDER for a plain file server."""
+    from static_site import export_site as export
+    app = current_app._get_current_object()
+    counts = export(app, full=full)
+    click.echo(f'{app.config["STATIC_SITE_FOLDER"]}: {counts["pages"]} page(s), {counts["pdfs"]} PDF(s), '
+               f'{counts["static"]} asset(s) written, {counts["removed"]} production(s) removed.')
+
+
+@click.command('live-server')
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', default=8765, type=int)
+def live_server(host, port):
+    """Serve the lobby's Server-Sent Events streams (set LIVE_UPDATES_URL to point at it)."""
+    import live
+    click.echo(f'Live updates on http://{host}:{port}/production/<id>/events')
+    live.run(current_app._get_current_object(), host, port)
+
+
+@click.command('sync-replica')
+def sync_replica():
+    """Copy the primary SQLite database into the read replica (local testing or a cron job)."""
+    from database import REPLICA_BIND, sync_sqlite_replica
+    config = current_app.config
+    replica = config.get('SQLALCHEMY_BINDS', {}).get(REPLICA_BIND)
+    if replica is None:
+        raise click.ClickException('No replica configured (set SQLALCHEMY_REPLICA_URI).')
+    if not (config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite') and replica['url'].startswith('sqlite')):
+        raise click.ClickException("sync-replica copies SQLite files; use the server's replication for PostgreSQL.")
+    sync_sqlite_replica(config['SQLALCHEMY_DATABASE_URI'], replica['url'])
+    click.echo(f'Copied the primary database to {replica["url"]}.')
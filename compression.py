@@ -0,0 +1,115 @@
+# compression.py
+"""Smaller rendered pages: whitespace stripped at template compile time, gzip/brotli on the wire.
+
+- WhitespaceExtension removes indentation, trailing spaces and blank lines
+  from the template source before Jinja compiles it (with trim_blocks /
+  lstrip_blocks for the lines holding only a block tag), so nothing is left
+  to strip per request. Line breaks are kept, since they separate words in
+  inline text, and <pre>/<textarea> blocks are left alone.
+- compress_response() (after_request) compresses HTML, JSON and other text
+  bodies of at least COMPRESS_MIN_SIZE bytes with brotli (when installed) or
+  gzip, whichever the client accepts first. Compressed responses get a weak
+  ETag and ``Vary: Accept-Encoding``.
+- cache.cached_page stores the compressed bytes next to the cached page
+  (cached_body()), so a page-cache hit is sent without compressing again.
+  Files sent by assets.send_asset use their precompressed siblings instead.
+"""
+
+import gzip
+import re
+
+from flask import current_app, request
+from jinja2.ext import Extension
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/html', 'text/plain', 'text/css', 'text/csv', 'application/json',
+                      'application/javascript', 'image/svg+xml')
+PRESERVE = re.compile(r'<(pre|textarea)\b.*?</\1>', re.DOTALL | re.IGNORECASE)
+LINE_SPACE = re.compile(r'^[ \t]+|[ \t]+$', re.MULTILINE)
+BLANK_LINES = re.compile(r'\n{2,}')
+
+
+def _squeeze(source):
+    return BLANK_LINES.sub('\n', LINE_SPACE.sub('', source))
+
+
+class WhitespaceExtension(Extension):
+    def preprocess(self, source, name, filename=None):
+        parts, pos = [], 0
+        for match in PRESERVE.finditer(source):
+            parts += [_squeeze(source[pos:match.start()]), match.group(0)]
+            pos = match.end()
+        parts.append(_squeeze(source[pos:]))
+        return ''.join(parts)
+
+
+def choose_encoding(mimetype, size):
+    """The Content-Encoding to send a body of this type and size with, or None."""
+    config = current_app.config
+    if not config['COMPRESS_RESPONSES'] or mimetype not in COMPRESSIBLE_TYPES or size < config['COMPRESS_MIN_SIZE']:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def encode(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=current_app.config['BROTLI_QUALITY'])
+    return gzip.compress(data, current_app.config['GZIP_LEVEL'], mtime=0)
+
+
+def cached_body(body, mimetype, encoded):
+    """(data, encoding, changed) to send for a cached page.
+
+    `encoded` maps encodings to compressed bodies stored with the page; a
+    missing one is compressed once and added (changed=True, so the caller
+    stores the entry again).
+    """
+    encoding = choose_encoding(mimetype, len(body))
+    if encoding is None:
+        return body, None, False
+    data = encoded.get(encoding)
+    if data is not None:
+        return data, encoding, False
+    data = encoded[encoding] = encode(body, encoding)
+    return data, encoding, True
+
+
+def set_encoded(resp, data, encoding):
+    """Give resp the body `data`, already encoded with `encoding` (None: uncompressed)."""
+    resp.set_data(data)
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    if resp.mimetype in COMPRESSIBLE_TYPES:
+        resp.vary.add('Accept-Encoding')
+
+
+def compress_response(resp):
+    if resp.mimetype not in COMPRESSIBLE_TYPES or resp.direct_passthrough or resp.is_streamed \
+            or 'Content-Encoding' in resp.headers or resp.status_code in (204, 206, 304):
+        return resp
+    resp.vary.add('Accept-Encoding')
+    encoding = choose_encoding(resp.mimetype, resp.content_length or 0)
+    if encoding is None:
+        return resp
+    etag, weak = resp.get_etag()
+    set_encoded(resp, encode(resp.get_data(), encoding), encoding)
+    if etag and not weak:  # the bytes differ from the uncompressed response's
+        resp.set_etag(etag, weak=True)
+    return resp
+
+
+def init_app(app):
+    if app.config.get('MINIFY_TEMPLATES'):
+        app.jinja_env.trim_blocks = True
+        app.jinja_env.lstrip_blocks = True
+        app.jinja_env.add_extension(WhitespaceExtension)
+    app.after_request(compress_response)
@@ -0,0 +1,163 @@
+# database.py
+"""Database connection profile: URIs from the environment, pool sizing, SQLite pragmas, read routing.
+
+The default "tuned" SQLite profile switches the file to WAL so audience reads
+don't block behind director writes, and sets the per-connection pragmas
+below on every new pooled connection. SQLITE_PROFILE=default keeps SQLite's
+stock settings (useful for before/after benchmarks), except that foreign key
+enforcement is always switched on.
+
+With a read replica configured (SQLALCHEMY_REPLICA_URI or DATABASE_REPLICA_URL,
+SQLite or PostgreSQL like the primary) it becomes the "replica" engine, and
+requests that call read_from_replica() (the view_bp GET pages) run their
+SELECTs there. Flushes, INSERT/UPDATE/DELETE and everything else go to the
+primary. A visitor who made a change (any non-GET request) reads from the
+primary for READ_YOUR_WRITES_SECONDS afterwards, so a director never sees
+their edit disappear behind replication lag. Page-cache misses also render
+from the primary (cache.cached_page), so a lagging replica is never cached.
+SQLite replicas are opened with ``query_only``; `flask --app app sync-replica`
+copies the primary file into the replica for local testing.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from flask import current_app, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+TUNED_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',    # safe with WAL; fsync at checkpoints instead of every commit
+    'busy_timeout': 5000,       # ms to wait for a lock instead of failing with "database is locked"
+    'cache_size': -20000,       # negative = KiB, so ~20 MB page cache per connection
+    'mmap_size': 268435456,     # 256 MB of the file memory-mapped for reads
+    'temp_store': 'MEMORY',
+}
+SQLITE_FOREIGN_KEYS = {'foreign_keys': 'ON'}  # off by default in SQLite, per connection
+REPLICA_BIND = 'replica'
+WROTE_AT = '_wrote_at'  # session key: when this visitor last changed something
+PRIMARY_ENVIRON = 'musical.read_primary'  # set by internal requests that must not read the replica
+
+
+def _uri(value):
+    if value and value.startswith('postgres://'):  # Render/Heroku style URLs
+        value = 'postgresql://' + value[len('postgres://'):]
+    return value
+
+
+def _engine_options(uri):
+    # one sync gunicorn worker needs a single connection; threaded workers need one per thread
+    threads = int(os.environ.get('GUNICORN_THREADS', 1))
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', max(threads, 2))),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', threads)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+    if not uri.startswith('sqlite'):
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = 1800
+    elif ':memory:' in uri or uri in ('sqlite://', 'sqlite:///'):
+        options = {}  # in-memory databases use a single static connection
+    return options
+
+
+def configure_database(app, default_uri):
+    """Fill in SQLALCHEMY_* settings for `app`; call before db.init_app(app)."""
+    uri = _uri(os.environ.get('SQLALCHEMY_DATABASE_URI') or os.environ.get('DATABASE_URL') or default_uri)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+
+    profile = os.environ.get('SQLITE_PROFILE', 'tuned')
+    # foreign keys are enforced in every profile: deletes rely on ON DELETE CASCADE
+    app.config['SQLITE_PRAGMAS'] = dict(SQLITE_FOREIGN_KEYS, **(TUNED_SQLITE_PRAGMAS if profile == 'tuned' else {}))
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', _engine_options(uri))
+
+    replica = _uri(os.environ.get('SQLALCHEMY_REPLICA_URI') or os.environ.get('DATABASE_REPLICA_URL'))
+    if replica:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = {'url': replica, **_engine_options(replica)}
+    # seconds after a change during which that visitor's reads stay on the primary
+    app.config['READ_YOUR_WRITES_SECONDS'] = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+
+
+def install_pragmas(app, db):
+    """Apply SQLITE_PRAGMAS to every new connection of the app's SQLite engines."""
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    with app.app_context():
+        engines = dict(db.engines)
+    for key, engine in engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        # the replica is written only by replication (sync-replica), never through the app
+        engine_pragmas = dict(pragmas, query_only='ON') if key == REPLICA_BIND else pragmas
+
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record, engine_pragmas=engine_pragmas):
+            cursor = dbapi_connection.cursor()
+            for name, value in engine_pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
+
+
+class RoutingSession(Session):
+    """db.session: SELECTs go to the replica engine while session.info['replica'] is set.
+
+    Flushes and INSERT/UPDATE/DELETE statements always use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('replica') and not self._flushing \
+                and not isinstance(clause, UpdateBase):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def wrote_recently():
+    """True while the visitor's own recent change may not have reached the replica yet."""
+    wrote_at = session.get(WROTE_AT)
+    return wrote_at is not None and time.time() - wrote_at < current_app.config['READ_YOUR_WRITES_SECONDS']
+
+
+def read_from_replica():
+    """before_request hook: route this GET request's reads to the replica, if there is one."""
+    if REPLICA_BIND not in current_app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+    if request.method not in ('GET', 'HEAD') or request.environ.get(PRIMARY_ENVIRON) or wrote_recently():
+        return
+    current_app.extensions['sqlalchemy'].session.info['replica'] = True
+
+
+def remember_write():
+    """before_request hook: note the time of a change, so read_from_replica() skips the replica for a while."""
+    if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        session[WROTE_AT] = time.time()
+
+
+@contextmanager
+def primary_reads():
+    """Run a block's reads on the primary, e.g. rendering a page that will be cached."""
+    info = current_app.extensions['sqlalchemy'].session.info
+    previous = info.pop('replica', None)
+    try:
+        yield
+    finally:
+        if previous:
+            info['replica'] = previous
+
+
+def sync_sqlite_replica(primary_uri, replica_uri):
+    """Copy the primary SQLite database into the replica file (SQLite's online backup)."""
+    import sqlite3
+    from sqlalchemy.engine import make_url
+    paths = [make_url(uri).database for uri in (primary_uri, replica_uri)]
+    source, target = sqlite3.connect(paths[0]), sqlite3.connect(paths[1])
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
@@ -0,0 +1,36 @@
+# gunicorn.conf.py
+"""Serving profile picked up by `gunicorn app:app` from the project directory.
+
+    WEB_CONCURRENCY        workers (default: 2 x CPUs + 1, at most 8)
+    GUNICORN_THREADS       threads per worker; above 1 the default class is gthread
+                           (database.py sizes the connection pool from it too)
+    GUNICORN_WORKER_CLASS  override the worker class (sync, gthread, ...)
+    GUNICORN_PRELOAD       1 (default) imports and warms the app once in the master
+                           (see prefork.py); 0 loads it in every worker
+
+gunicorn binds 0.0.0.0:$PORT when PORT is set, as on Render.
+"""
+
+import os
+
+try:
+    cpus = len(os.sched_getaffinity(0))  # honours CPU pinning in containers
+except AttributeError:
+    cpus = os.cpu_count() or 1
+
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * cpus + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    if preload_app:
+        import prefork
+        prefork.warm(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import prefork
+        prefork.after_fork(worker.app.wsgi())
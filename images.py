@@ -0,0 +1,105 @@
+# images.py
+"""Cover image uploads: content-hashed originals plus resized WebP/JPEG variants.
+
+The original is stored as ``<sha256 prefix>.<ext>`` so identical uploads share
+one file and every URL can be cached forever. Width-bounded variants
+(``<hash>-<width>.webp`` / ``.jpg``) are generated on a background thread so
+the upload request returns immediately; templates only reference variants
+that already exist (see cover_sources).
+
+Pillow is optional: without it only the original is stored and served.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow not installed
+    Image = None
+
+# thumbnail for the viewer list cards, medium for the program page and high-DPI cards
+VARIANT_WIDTHS = (400, 900)
+VARIANT_FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}),
+                   'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cover-variants')
+
+
+def _variant_name(stem, width, ext):
+    return f'{stem}-{width}.{ext}'
+
+
+def save_cover(file, upload_folder):
+    """Store an uploaded cover under its content hash.
+
+    Returns (url, future): the /uploads URL of the original and a Future for
+    the background variant job, or None when there is nothing to generate.
+    """
+    data = file.read()
+    ext = file.filename.rsplit('.', 1)[1].lower()
+    ext = 'jpg' if ext == 'jpeg' else ext
+    stem = hashlib.sha256(data).hexdigest()[:20]
+    os.makedirs(upload_folder, exist_ok=True)
+    path = os.path.join(upload_folder, f'{stem}.{ext}')
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    url = f'/uploads/{stem}.{ext}'
+    if Image is None or _variants_exist(upload_folder, stem):
+        return url, None
+    return url, _executor.submit(generate_variants, path)
+
+
+def generate_variants(path):
+    """Write every width/format variant of the image at `path` (skipping existing ones)."""
+    folder, name = os.path.split(path)
+    stem = name.rsplit('.', 1)[0]
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        for width in VARIANT_WIDTHS:
+            resized = img.copy()
+            if resized.width > width:
+                resized.thumbnail((width, width * 4), Image.LANCZOS)
+            for ext, (fmt, options) in VARIANT_FORMATS.items():
+                target = os.path.join(folder, _variant_name(stem, width, ext))
+                if os.path.exists(target):
+                    continue
+                tmp = target + '.tmp'
+                resized.save(tmp, fmt, **options)
+                os.replace(tmp, target)
+
+
+def _variants_exist(folder, stem):
+    return all(os.path.exists(os.path.join(folder, _variant_name(stem, w, ext)))
+               for w in VARIANT_WIDTHS for ext in VARIANT_FORMATS)
+
+
+def _write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def cover_sources(cover_url):
+    """Template helper: srcsets for a cover's generated variants.
+
+    Returns {'webp': ..., 'jpg': ...} srcset strings plus 'src' (the largest
+    JPEG variant, for browsers without srcset), or {} when the cover has no
+    variants yet, in which case the template uses the original.
+    """
+    if not cover_url or not cover_url.startswith('/uploads/'):
+        return {}
+    stem = cover_url[len('/uploads/'):].rsplit('.', 1)[0]
+    folder = current_app.config['UPLOAD_FOLDER']
+    if not _variants_exist(folder, stem):
+        return {}
+    sources = {ext: ', '.join(f'/uploads/{_variant_name(stem, w, ext)} {w}w' for w in VARIANT_WIDTHS)
+               for ext in VARIANT_FORMATS}
+    sources['src'] = f'/uploads/{_variant_name(stem, VARIANT_WIDTHS[-1], "jpg")}'
+    return sources
@@ -0,0 +1,87 @@
+# importer.py
+"""Streaming student roster import.
+
+Rows are read straight from the uploaded file stream, deduplicated against the
+existing roster with a single query, and inserted in executemany batches inside
+one transaction.
+"""
+
+import csv
+import io
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Student
+
+BATCH_SIZE = 1000
+
+
+def insert_ignoring_duplicates():
+    # the unique index on students.name is the final guard against concurrent imports
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(Student).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(Student).on_conflict_do_nothing()
+    return insert(Student)
+
+
+def import_students(stream, batch_size=BATCH_SIZE):
+    """Import students from a binary CSV stream with a ``name`` column (``sex``/``year`` optional).
+
+    Returns a summary dict: inserted, skipped (already on the roster or repeated
+    in the file), malformed (unreadable rows or rows without a name) and seconds.
+    """
+    started = time.perf_counter()
+    summary = {'inserted': 0, 'skipped': 0, 'malformed': 0, 'seconds': 0.0}
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    reader = csv.reader(text)
+    header = next((r for r in reader if any(r)), None)  # skip leading blank lines
+    columns = {c.strip().lower(): i for i, c in enumerate(header or [])}
+    if 'name' not in columns:
+        summary['error'] = 'CSV header must include a "name" column'
+        return summary
+    name_i, sex_i, year_i = columns['name'], columns.get('sex'), columns.get('year')
+
+    def field(row, i):
+        return row[i].strip() if i is not None and i < len(row) else ''
+
+    seen = set(db.session.execute(select(Student.name)).scalars())
+    stmt = insert_ignoring_duplicates()
+    batch = []
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            break
+        except csv.Error:
+            summary['malformed'] += 1
+            continue
+        if not any(row):
+            continue
+        name = field(row, name_i)
+        if not name:
+            summary['malformed'] += 1
+            continue
+        if name in seen:
+            summary['skipped'] += 1
+            continue
+        seen.add(name)
+        batch.append({'name': name, 'sex': field(row, sex_i), 'year': field(row, year_i)})
+        if len(batch) >= batch_size:
+            db.session.execute(stmt, batch)
+            summary['inserted'] += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(stmt, batch)
+        summary['inserted'] += len(batch)
+    db.session.commit()
+    summary['seconds'] = round(time.perf_counter() - started, 4)
+    return summary
+
+
+def import_students_from_csv(filepath):
+    with open(filepath, 'rb') as f:
+        return import_students(f)
@@ -0,0 +1,284 @@
+# instrumentation.py
+"""Per-request timing, SQL counts, Server-Timing headers, /metrics and an on-demand profiler.
+
+Every response carries a ``Server-Timing`` header splitting the request into
+database time (with the statement count), template rendering and total, so
+the browser's network panel shows where a slow page spent its time. Requests
+slower than SLOW_REQUEST_MS are logged with the same breakdown.
+
+``GET /metrics`` exposes per-endpoint latency histograms and DB/template
+totals in the Prometheus text format. Metrics are kept per process; scrape
+each gunicorn worker (or run one worker) to see everything.
+
+With ALLOW_PROFILING set (or in debug mode), adding ``?_profile=1`` to any
+URL samples the request thread's stack every PROFILE_INTERVAL seconds and
+returns a text report of the hottest functions instead of the page;
+``?_profile=collapsed`` returns folded stacks for flamegraph.pl / speedscope.
+"""
+
+import collections
+import os
+import sys
+import threading
+import time
+
+from flask import current_app, g, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+from cache import page_cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack on a background thread.
+
+    The interpreter's thread switch interval (5 ms by default) is lowered to
+    the sampling interval while profiling, or the sampler would rarely get
+    the GIL while the request thread is busy.
+    """
+
+    def __init__(self, thread_id, interval=0.001, root=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root = root
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._labels = {}
+
+    def start(self):
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        sys.setswitchinterval(self._switch_interval)
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            if self.root and path.startswith(self.root):
+                path = os.path.relpath(path, self.root)
+            elif 'site-packages' in path:
+                path = path.split('site-packages' + os.sep, 1)[1]
+            label = self._labels[code] = f'{code.co_name} ({path}:{code.co_firstlineno})'
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        return ''.join(f'{";".join(stack)} {count}\n' for stack, count in self.stacks.most_common())
+
+    def report(self, limit=30):
+        own, total = collections.Counter(), collections.Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        n = self.samples or 1
+        lines = [f'{self.samples} samples over {self.elapsed * 1000:.1f} ms '
+                 f'(every {self.interval * 1000:g} ms)', '', 'Self time:']
+        lines += [f'  {c / n:6.1%}  {label}' for label, c in own.most_common(limit)]
+        lines += ['', 'Including callees:']
+        lines += [f'  {c / n:6.1%}  {label}' for label, c in total.most_common(limit)]
+        return '\n'.join(lines) + '\n'
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Instrumentation:
+    def __init__(self, app=None, db=None):
+        self._lock = threading.Lock()
+        self.reset()
+        if app is not None:
+            self.init_app(app, db)
+
+    def reset(self):
+        """Forget everything recorded so far (e.g. warm-up requests before a fork)."""
+        self.latency = {}  # (endpoint, method) -> Histogram
+        self.db_seconds = collections.Counter()
+        self.queries = collections.Counter()
+        self.template_seconds = collections.Counter()
+        self.statuses = collections.Counter()  # (endpoint, status) -> requests
+
+    def init_app(self, app, db):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('SLOW_REQUEST_MS', 500)
+        app.config.setdefault('ALLOW_PROFILING', False)
+        app.config.setdefault('PROFILE_INTERVAL', 0.001)
+
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        if app.config['METRICS_ENABLED']:
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    # -- collection -------------------------------------------------------
+    @staticmethod
+    def _timing():
+        # None outside a request (CLI commands, background jobs) or before _before_request ran
+        try:
+            return g.get('_timing')
+        except RuntimeError:
+            return None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['_query_started'].pop()
+        timing = self._timing()
+        if timing is not None:
+            timing['db'] += time.perf_counter() - started
+            timing['queries'] += 1
+
+    def _before_render(self, sender, template, context, **extra):
+        timing = self._timing()
+        if timing is not None:
+            timing['_render_started'] = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        timing = self._timing()
+        if timing is not None and '_render_started' in timing:
+            timing['template'] += time.perf_counter() - timing.pop('_render_started')
+
+    def _before_request(self):
+        g._timing = {'start': time.perf_counter(), 'db': 0.0, 'queries': 0, 'template': 0.0}
+        mode = request.args.get('_profile')
+        if mode and (current_app.debug or current_app.config['ALLOW_PROFILING']):
+            g._profiler = SamplingProfiler(threading.get_ident(), current_app.config['PROFILE_INTERVAL'],
+                                           current_app.root_path).start()
+
+    def _after_request(self, response):
+        timing = g.pop('_timing', None)
+        if timing is None:
+            return response
+        total = time.perf_counter() - timing['start']
+        response.headers['Server-Timing'] = (
+            f'db;dur={timing["db"] * 1000:.2f};desc="{timing["queries"]} queries", '
+            f'tpl;dur={timing["template"] * 1000:.2f}, total;dur={total * 1000:.2f}')
+
+        self.record(request.endpoint or '<unmatched>', request.method, response.status_code, total,
+                    timing['db'], timing['queries'], timing['template'])
+
+        if total * 1000 >= current_app.config['SLOW_REQUEST_MS']:
+            current_app.logger.warning('slow request %s %s: %.0f ms (db %.0f ms / %d queries, templates %.0f ms)',
+                                       request.method, request.full_path.rstrip('?'), total * 1000,
+                                       timing['db'] * 1000, timing['queries'], timing['template'] * 1000)
+
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            profiler.stop()
+            body = profiler.collapsed() if request.args['_profile'] == 'collapsed' else profiler.report()
+            profiled = current_app.response_class(body, mimetype='text/plain')
+            profiled.headers['Server-Timing'] = response.headers['Server-Timing']
+            profiled.headers['Cache-Control'] = 'no-store'
+            return profiled
+        return response
+
+    def record(self, endpoint, method, status, seconds, db_seconds=0.0, queries=0, template_seconds=0.0):
+        """Count one finished request in the /metrics histograms and totals.
+
+        Called by _after_request, and by asgi.py for the pages it serves
+        without going through Flask.
+        """
+        with self._lock:
+            histogram = self.latency.get((endpoint, method))
+            if histogram is None:
+                histogram = self.latency[(endpoint, method)] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            self.db_seconds[endpoint] += db_seconds
+            self.queries[endpoint] += queries
+            self.template_seconds[endpoint] += template_seconds
+            self.statuses[(endpoint, status)] += 1
+
+    def _teardown_request(self, exc):
+        profiler = g.pop('_profiler', None)  # only left over when the response was never built
+        if profiler is not None:
+            profiler.stop()
+
+    # -- exposition -------------------------------------------------------
+    def render_metrics(self):
+        def labels(**values):
+            return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in values.items()) + '}'
+
+        lines = ['# HELP musical_request_duration_seconds Request latency by endpoint.',
+                 '# TYPE musical_request_duration_seconds histogram']
+        with self._lock:
+            for (endpoint, method), h in sorted(self.latency.items()):
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f'musical_request_duration_seconds_bucket'
+                                 f'{labels(endpoint=endpoint, method=method, le=f"{bound:g}")} {count}')
+                lines.append(f'musical_request_duration_seconds_bucket'
+                             f'{labels(endpoint=endpoint, method=method, le="+Inf")} {h.count}')
+                lines.append(f'musical_request_duration_seconds_sum{labels(endpoint=endpoint, method=method)} '
+                             f'{h.sum:.6f}')
+                lines.append(f'musical_request_duration_seconds_count{labels(endpoint=endpoint, method=method)} '
+                             f'{h.count}')
+            for name, help_text, values, fmt in (
+                    ('musical_request_db_seconds_total', 'Time spent executing SQL.', self.db_seconds, '.6f'),
+                    ('musical_request_queries_total', 'SQL statements executed.', self.queries, 'd'),
+                    ('musical_request_template_seconds_total', 'Time spent rendering templates.',
+                     self.template_seconds, '.6f')):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                lines += [f'{name}{labels(endpoint=e)} {v:{fmt}}' for e, v in sorted(values.items())]
+            lines += ['# HELP musical_responses_total Responses by endpoint and status.',
+                      '# TYPE musical_responses_total counter']
+            lines += [f'musical_responses_total{labels(endpoint=e, status=s)} {v}'
+                      for (e, s), v in sorted(self.statuses.items())]
+
+        stats = page_cache.stats()
+        lines += ['# HELP musical_page_cache_lookups_total Page cache lookups by result.',
+                  '# TYPE musical_page_cache_lookups_total counter',
+                  f'musical_page_cache_lookups_total{labels(result="hit")} {stats["hits"]}',
+                  f'musical_page_cache_lookups_total{labels(result="miss")} {stats["misses"]}']
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        resp = current_app.response_class(self.render_metrics(), mimetype='text/plain; version=0.0.4')
+        resp.headers['Cache-Control'] = 'no-store'
+        return resp
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,225 @@
+# live.py
+"""Live updates for the lobby display (Server-Sent Events).
+
+The event stream is served by a small asyncio server in its own process
+(`flask --app app live-server`), so hundreds of idle lobby connections cost a
+socket and a queue each instead of a gunicorn worker. Point the viewer page
+at it with LIVE_UPDATES_URL (e.g. ``/live`` behind the same proxy, with
+buffering off, or ``http://host:8765``); without it the page is unchanged.
+
+    GET <LIVE_UPDATES_URL>/production/<id>/events?revision=<page revision>
+
+Edits already bump ``productions.revision`` (routes.commit_production_change).
+The live server checks the revisions of watched productions every
+LIVE_POLL_INTERVAL seconds (one query for all of them), and immediately when
+an edit sends a UDP datagram to LIVE_NOTIFY_ADDR (``host:port``, optional).
+For each change it sends only what differs from the last state: ``cast``
+(changed/removed roles plus the role order), ``section`` (a replaced team /
+songs / crew / thanks list) and ``production`` (text fields); anything the
+page cannot patch in place (cover, a field appearing or disappearing, a
+missed revision) is sent as ``reload``. static/live.js applies the events.
+"""
+
+import asyncio
+import json
+import re
+import socket
+from urllib.parse import parse_qs, urlsplit
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, Production
+
+FIELDS = ('title', 'subtitle', 'dates_text', 'location', 'price', 'copyright', 'notes', 'cover_filename')
+SECTIONS = ('team', 'songs', 'crew', 'thanks')
+EVENTS_PATH = re.compile(r'^/production/(\d+)/events$')
+HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+
+_notify_socket = None
+
+
+def notify(production_id):
+    """Tell the live server (if LIVE_NOTIFY_ADDR is set) that a production changed. Never raises."""
+    global _notify_socket
+    addr = current_app.config.get('LIVE_NOTIFY_ADDR')
+    if not addr:
+        return
+    host, _, port = addr.rpartition(':')
+    try:
+        if _notify_socket is None:
+            _notify_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            _notify_socket.setblocking(False)
+        _notify_socket.sendto(str(production_id).encode(), (host or '127.0.0.1', int(port)))
+    except (OSError, ValueError):
+        pass
+
+
+def load_state(production_id):
+    """What the viewer page shows for a production, as plain data (None if it is gone)."""
+    from api import LOADERS
+    # the revision is read first: if an edit lands mid-load the data is newer than the
+    # label, and the next poll sees the higher revision and sends the difference
+    row = db.session.execute(select(Production.revision, *(getattr(Production, f) for f in FIELDS))
+                             .where(Production.id == production_id)).first()
+    if row is None:
+        return None
+    cast = [{'id': r['id'], 'role': r['role'], 'students': ', '.join(s['name'] for s in r['students'])}
+            for r in LOADERS['cast'](production_id)]
+    # each line is [bold, separator, text], mirroring viewer_production.jinja
+    sections = {
+        'team': [[t['position'], ': ', t['name']] for t in LOADERS['team'](production_id)],
+        'songs': [[f'Act {s["act"]} — {s["title"]}', ' — ' if s['performers'] else '', s['performers'] or '']
+                  for s in LOADERS['songs'](production_id)],
+        'crew': [['', '', f'{c["name"]} — {c["responsibility"] or "Crew"}'] for c in LOADERS['crew'](production_id)],
+        'thanks': [['', '', t['text']] for t in LOADERS['thanks'](production_id)],
+    }
+    return {'revision': row[0], 'fields': dict(zip(FIELDS, row[1:])), 'cast': cast, 'sections': sections}
+
+
+def diff_events(old, new):
+    """[(event, data)] turning a page showing `old` into one showing `new`."""
+    if new is None:
+        return [('reload', {})]
+    changed = {f: new['fields'][f] for f in FIELDS if new['fields'][f] != old['fields'][f]}
+    if 'cover_filename' in changed or any(bool(v) != bool(old['fields'][f]) for f, v in changed.items()):
+        return [('reload', {})]
+    events = []
+    if changed:
+        events.append(('production', changed))
+    if new['cast'] != old['cast']:
+        before = {r['id']: r for r in old['cast']}
+        after_ids = {r['id'] for r in new['cast']}
+        events.append(('cast', {
+            'changed': [r for r in new['cast'] if before.get(r['id']) != r],
+            'removed': [rid for rid in before if rid not in after_ids],
+            'order': [r['id'] for r in new['cast']],
+        }))
+    for section in SECTIONS:
+        if new['sections'][section] != old['sections'][section]:
+            events.append(('section', {'section': section, 'lines': new['sections'][section]}))
+    return events
+
+
+def _format(revision, event, data):
+    return f'id: {revision}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'.encode()
+
+
+class LiveServer:
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('LIVE_POLL_INTERVAL', 1.0)
+        self.subscribers = {}  # production id -> set of asyncio.Queue
+        self.states = {}  # production id -> last state sent to subscribers
+        self._wake = None
+
+    # database work runs on the default executor so the event loop never blocks on SQLite
+    def _in_app(self, fn, *args):
+        with self.app.app_context():
+            return fn(*args)
+
+    async def _db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, self._in_app, fn, *args)
+
+    @staticmethod
+    def _revisions(ids):
+        return dict(db.session.execute(select(Production.id, Production.revision)
+                                       .where(Production.id.in_(ids))).all())
+
+    async def poll(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self.subscribers:
+                continue
+            try:
+                revisions = await self._db(self._revisions, list(self.subscribers))
+                for pid in list(self.subscribers):
+                    old = self.states.get(pid)
+                    if old is not None and revisions.get(pid) == old['revision']:
+                        continue
+                    new = await self._db(load_state, pid)
+                    events = diff_events(old, new) if old is not None else [('reload', {})]
+                    revision = new['revision'] if new else 0
+                    if new is None:
+                        self.states.pop(pid, None)
+                    else:
+                        self.states[pid] = new
+                    payload = b''.join(_format(revision, e, d) for e, d in events)
+                    for queue in self.subscribers.get(pid, ()):
+                        queue.put_nowait(payload)
+            except Exception:  # keep serving; the next tick retries
+                self.app.logger.exception('live update poll failed')
+
+    async def handle(self, reader, writer):
+        queue = pid = None
+        try:
+            request_line = (await asyncio.wait_for(reader.readline(), 10)).decode('latin-1')
+            while (await asyncio.wait_for(reader.readline(), 10)) not in (b'\r\n', b'\n', b''):
+                pass  # headers are not needed: the page passes its revision in the query string
+            method, target, _ = (request_line.split() + ['', '', ''])[:3]
+            url = urlsplit(target)
+            match = EVENTS_PATH.match(url.path)
+            if method != 'GET' or not match:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                return
+            pid = int(match.group(1))
+            state = self.states.get(pid) if pid in self.subscribers else None
+            if state is None:
+                state = await self._db(load_state, pid)
+            if state is None:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                return
+            self.states.setdefault(pid, state)
+            queue = asyncio.Queue()
+            self.subscribers.setdefault(pid, set()).add(queue)
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n'
+                         b'Access-Control-Allow-Origin: *\r\nX-Accel-Buffering: no\r\nConnection: keep-alive\r\n\r\n'
+                         b'retry: 3000\n\n')
+            page_revision = parse_qs(url.query).get('revision', [None])[0]
+            if page_revision is not None and page_revision != str(state['revision']):
+                writer.write(_format(state['revision'], 'reload', {}))  # the page missed an edit
+            await writer.drain()
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    payload = b': ping\n\n'
+                writer.write(payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError, ValueError):
+            pass
+        finally:
+            if queue is not None:
+                subscribers = self.subscribers.get(pid, set())
+                subscribers.discard(queue)
+                if not subscribers:
+                    self.subscribers.pop(pid, None)
+                    self.states.pop(pid, None)
+            writer.close()
+
+    async def serve(self, host, port, notify_addr=None):
+        self._wake = asyncio.Event()
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        if notify_addr:
+            notify_host, _, notify_port = notify_addr.rpartition(':')
+            wake = self._wake
+
+            class Notified(asyncio.DatagramProtocol):
+                def datagram_received(self, data, addr):
+                    wake.set()
+            await asyncio.get_running_loop().create_datagram_endpoint(
+                Notified, local_addr=(notify_host or '127.0.0.1', int(notify_port)))
+        poller = asyncio.create_task(self.poll())
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                poller.cancel()
+
+
+def run(app, host='127.0.0.1', port=8765):
+    asyncio.run(LiveServer(app).serve(host, port, app.config.get('LIVE_NOTIFY_ADDR')))
@@ -0,0 +1,149 @@
+# migrations.py
+"""Schema creation and upgrades, run once by `flask init-db` (never per request).
+
+db.create_all() only creates missing tables, so columns and indexes added to
+existing tables are applied here. The applied version is recorded in the
+schema_version table; bump SCHEMA_VERSION whenever the models change so
+existing databases are upgraded on the next init-db.
+"""
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import AddConstraint, CreateTable
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from ordering import backfill as backfill_order
+from performers import backfill as backfill_performers
+from search import create_fts_index
+
+SCHEMA_VERSION = 6
+
+# (table, column, column DDL)
+ADDED_COLUMNS = [
+    ('productions', 'revision', 'INTEGER NOT NULL DEFAULT 0'),
+]
+
+# run before the unique indexes are created so old duplicate rows don't block them
+DEDUPE_STATEMENTS = [
+    'DELETE FROM role_assignments WHERE id NOT IN '
+    '(SELECT MIN(id) FROM role_assignments GROUP BY role_id, student_id)',
+]
+
+# replaced by indexes that match the current queries
+DROPPED_INDEXES = ['ix_songs_production_act_title']
+
+log = logging.getLogger(__name__)
+
+
+def _create_index(index):
+    try:
+        with db.engine.begin() as conn:
+            index.create(conn, checkfirst=True)
+    except IntegrityError:
+        # e.g. duplicate student names; keep the lookup fast even if uniqueness can't be enforced yet
+        log.warning('duplicate rows in %s; creating %s as a non-unique index', index.table.name, index.name)
+        cols = ', '.join(c.name for c in index.columns)
+        with db.engine.begin() as conn:
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {index.name} ON {index.table.name} ({cols})'))
+
+
+def _stale_delete_rules(inspector, table):
+    """True if the existing table's ON DELETE rules differ from the model's (missing or extra)."""
+    have = {(col, ((fk.get('options') or {}).get('ondelete') or '').upper())
+            for fk in inspector.get_foreign_keys(table.name) for col in fk['constrained_columns']}
+    want = {(fk.parent.name, (fk.ondelete or '').upper()) for fk in table.foreign_keys}
+    return have != want
+
+
+def _rebuild_sqlite_table(conn, table):
+    """SQLite cannot alter constraints: copy the rows into a table created from the model and swap it in.
+
+    Rows pointing at parents that no longer exist are dropped on the way (they
+    would break ON DELETE CASCADE). Indexes are recreated by upgrade_schema.
+    """
+    existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+    columns = ', '.join(c.name for c in table.columns if c.name in existing)
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+    new = f'_new_{table.name}'
+    conn.exec_driver_sql(ddl.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {new} ', 1))
+    orphans = ' AND '.join(f'{fk.parent.name} IN (SELECT {fk.column.name} FROM {fk.column.table.name})'
+                           for fk in table.foreign_keys)
+    conn.exec_driver_sql(f'INSERT INTO {new} ({columns}) SELECT {columns} FROM {table.name}'
+                         + (f' WHERE {orphans}' if orphans else ''))
+    conn.exec_driver_sql(f'DROP TABLE {table.name}')
+    conn.exec_driver_sql(f'ALTER TABLE {new} RENAME TO {table.name}')
+
+
+def upgrade_foreign_keys():
+    """Give existing tables the model's foreign keys and ON DELETE rules."""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    stale = [t for t in db.metadata.sorted_tables if t.name in tables and _stale_delete_rules(inspector, t)]
+    if not stale:
+        return
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            # must be switched off outside a transaction, or dropping a parent table would cascade
+            conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            for table in stale:
+                log.info("rebuilding %s with the model's foreign keys", table.name)
+                _rebuild_sqlite_table(conn, table)
+            conn.commit()
+            conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+        else:
+            for table in stale:
+                for fk in inspector.get_foreign_keys(table.name):
+                    if fk['name']:
+                        conn.exec_driver_sql(f'ALTER TABLE {table.name} DROP CONSTRAINT {fk["name"]}')
+                for constraint in table.foreign_key_constraints:
+                    conn.execute(AddConstraint(constraint))
+            conn.commit()
+
+
+def upgrade_schema():
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    for table, column, ddl in ADDED_COLUMNS:
+        if table not in tables:
+            continue
+        if column not in {c['name'] for c in inspector.get_columns(table)}:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    for statement in DEDUPE_STATEMENTS:
+        db.session.execute(text(statement))
+    for name in DROPPED_INDEXES:
+        db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    if {'songs', 'roles'} <= tables:
+        backfill_order()
+    if 'song_performers' in tables:
+        backfill_performers()
+    db.session.commit()
+    upgrade_foreign_keys()
+    for table in db.metadata.sorted_tables:
+        if table.name in tables:
+            for index in table.indexes:
+                _create_index(index)
+    with db.engine.begin() as conn:
+        if not create_fts_index(conn):
+            log.info('FTS5 unavailable; student search uses the in-memory index')
+
+
+def current_version():
+    with db.engine.connect() as conn:
+        if not inspect(conn).has_table('schema_version'):
+            return 0
+        return conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+
+def init_db():
+    """Create and upgrade the schema if needed. Returns True if any work was done."""
+    if current_version() >= SCHEMA_VERSION:
+        return False
+    db.create_all()
+    upgrade_schema()
+    with db.engine.begin() as conn:
+        conn.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+        conn.execute(text('DELETE FROM schema_version'))
+        conn.execute(text('INSERT INTO schema_version (version) VALUES (:v)'), {'v': SCHEMA_VERSION})
+    return True
@@ -6,7 +6,7 @@ from datetime import date
 class Student(db.Model):
     __tablename__ = 'students'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(128), nullable=False)
+    name = db.Column(db.String(128), nullable=False, unique=True, index=True)
     sex = db.Column(db.String(10))
     year = db.Column(db.String(20))
 
@@ -27,6 +27,7 @@ class Student(db.Model):
 # Productions (one production can have many roles, songs, etc.)
 class Production(db.Model):
     __tablename__ = 'productions'
+    __table_args__ = (db.Index('ix_productions_title', 'title'),)
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(256), nullable=False)
     subtitle = db.Column(db.String(256))
@@ -36,28 +37,45 @@ class Production(db.Model):
     price = db.Column(db.String(64))
     copyright = db.Column(db.String(256))
     notes = db.Column(db.Text)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # bumped on every edit
 
-    roles = db.relationship('Role', backref='production', cascade='all, delete-orphan')
-    songs = db.relationship('Song', backref='production', cascade='all, delete-orphan')
-    team = db.relationship('TeamMember', backref='production', cascade='all, delete-orphan')
-    crew = db.relationship('CrewAssignment', backref='production', cascade='all, delete-orphan')
+    # running order (see ordering.py), read straight off the order_index indexes;
+    # child rows are removed by ON DELETE CASCADE in the database, not loaded and deleted one by one
+    roles = db.relationship('Role', backref='production', cascade='all, delete-orphan', passive_deletes=True,
+                            order_by=lambda: (Role.order_index, Role.id))
+    songs = db.relationship('Song', backref='production', cascade='all, delete-orphan', passive_deletes=True,
+                            order_by=lambda: (Song.act, Song.order_index, Song.id))
+    team = db.relationship('TeamMember', backref='production', cascade='all, delete-orphan',
+                           passive_deletes=True)
+    crew = db.relationship('CrewAssignment', backref='production', cascade='all, delete-orphan',
+                           passive_deletes=True)
 
 # Roles (individual roles or grouped roles)
 class Role(db.Model):
     __tablename__ = 'roles'
+    __table_args__ = (
+        # the (production_id, name, is_group) lookup in add_role_assignment
+        db.Index('ix_roles_production_group_name', 'production_id', 'is_group', 'name'),
+        db.Index('ix_roles_production_order', 'production_id', 'order_index'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    production_id = db.Column(db.Integer, db.ForeignKey('productions.id'), nullable=False)
+    production_id = db.Column(db.Integer, db.ForeignKey('productions.id', ondelete='CASCADE'), nullable=False)
     name = db.Column(db.String(200), nullable=False)
     is_group = db.Column(db.Boolean, default=False)  # groups like "Ensemble"
-    order_index = db.Column(db.Integer, default=0)
+    order_index = db.Column(db.Integer, default=0)  # sparse running order, see ordering.py
 
-    assignments = db.relationship('RoleAssignment', backref='role', cascade='all, delete-orphan')
+    assignments = db.relationship('RoleAssignment', backref='role', cascade='all, delete-orphan',
+                                  passive_deletes=True)
 
 # Assignment table linking students to roles (many-to-many with extra row)
 class RoleAssignment(db.Model):
     __tablename__ = 'role_assignments'
+    __table_args__ = (
+        db.Index('uq_role_assignments_role_student', 'role_id', 'student_id', unique=True),
+        db.Index('ix_role_assignments_student', 'student_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False)
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id', ondelete='CASCADE'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
 
     student = db.relationship('Student')  # convenience
@@ -65,8 +83,12 @@ class RoleAssignment(db.Model):
 # Crew (student crew members)
 class CrewAssignment(db.Model):
     __tablename__ = 'crew_assignments'
+    __table_args__ = (
+        db.Index('ix_crew_assignments_production', 'production_id'),
+        db.Index('ix_crew_assignments_student', 'student_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    production_id = db.Column(db.Integer, db.ForeignKey('productions.id'), nullable=False)
+    production_id = db.Column(db.Integer, db.ForeignKey('productions.id', ondelete='CASCADE'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
     responsibility = db.Column(db.String(200))
 
@@ -75,8 +97,9 @@ class CrewAssignment(db.Model):
 # Creative team (adults)
 class TeamMember(db.Model):
     __tablename__ = 'team_members'
+    __table_args__ = (db.Index('ix_team_members_production', 'production_id'),)
     id = db.Column(db.Integer, primary_key=True)
-    production_id = db.Column(db.Integer, db.ForeignKey('productions.id'), nullable=False)
+    production_id = db.Column(db.Integer, db.ForeignKey('productions.id', ondelete='CASCADE'), nullable=False)
     name = db.Column(db.String(200), nullable=False)
     position = db.Column(db.String(200), nullable=False)
     notes = db.Column(db.String(256))
@@ -84,15 +107,40 @@ class TeamMember(db.Model):
 # Songs
 class Song(db.Model):
     __tablename__ = 'songs'
+    __table_args__ = (db.Index('ix_songs_production_act_order', 'production_id', 'act', 'order_index'),)
     id = db.Column(db.Integer, primary_key=True)
-    production_id = db.Column(db.Integer, db.ForeignKey('productions.id'), nullable=False)
+    production_id = db.Column(db.Integer, db.ForeignKey('productions.id', ondelete='CASCADE'), nullable=False)
     title = db.Column(db.String(256), nullable=False)
     act = db.Column(db.Integer, default=1)
-    order_index = db.Column(db.Integer, default=0)
+    order_index = db.Column(db.Integer, default=0)  # sparse running order, see ordering.py
     performers_text = db.Column(db.String(512))
 
 class Thanks(db.Model):
     __tablename__ = 'thanks'
+    __table_args__ = (db.Index('ix_thanks_production', 'production_id'),)
     id = db.Column(db.Integer, primary_key=True)
-    production_id = db.Column(db.Integer, db.ForeignKey('productions.id'), nullable=False)
-    text = db.Column(db.Text, nullable=False)
\ No newline at end of file
+    production_id = db.Column(db.Integer, db.ForeignKey('productions.id', ondelete='CASCADE'), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+
+# Roles singing each song, parsed from Song.performers_text (see performers.py)
+class SongPerformer(db.Model):
+    __tablename__ = 'song_performers'
+    __table_args__ = (
+        db.Index('uq_song_performers_song_role', 'song_id', 'role_id', unique=True),
+        db.Index('ix_song_performers_role', 'role_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id', ondelete='CASCADE'), nullable=False)
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id', ondelete='CASCADE'), nullable=False)
+
+# Precomputed: which songs each student sings and through which role (see performers.py)
+class StudentSong(db.Model):
+    __tablename__ = 'student_songs'
+    __table_args__ = (
+        db.Index('ix_student_songs_song', 'song_id'),
+        db.Index('ix_student_songs_role', 'role_id'),
+    )
+    # primary key order serves the rehearsal sheet lookup (student_id, role_id)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), primary_key=True)
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True)
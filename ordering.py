@@ -0,0 +1,113 @@
+# ordering.py
+"""Running order for songs and roles, stored as sparse ``order_index`` values.
+
+New rows are appended GAP after the current last one, so indexes are spaced
+out and moving one item between two neighbours only rewrites that item (it
+takes the midpoint). When two neighbours have no integer left between them
+the whole list is renumbered with one bulk UPDATE. A full ordering (what a
+drag-and-drop list sends after a drop) is also written with one UPDATE.
+
+Songs are ordered within their act, roles within their production; both
+scopes are served by the (production_id, [act,] order_index) indexes.
+"""
+
+from sqlalchemy import case, func, select, update
+
+from models import db, Role, Song
+
+GAP = 1024
+
+
+def _scope(model, production_id, act=None):
+    conditions = [model.production_id == production_id]
+    if model is Song and act is not None:
+        conditions.append(Song.act == act)
+    return conditions
+
+
+def next_index(model, production_id, act=None):
+    """SQL expression for "after the last item": assign it to order_index on insert (no extra query)."""
+    return (select(func.coalesce(func.max(model.order_index), 0) + GAP)
+            .where(*_scope(model, production_id, act)).scalar_subquery())
+
+
+def write_order(model, production_id, ids, **values):
+    """Give `ids` the order_index GAP, 2*GAP, ... in list order with a single UPDATE.
+
+    Extra keyword values (e.g. act=2) are set on the same rows. Returns the row count.
+    """
+    if not ids:
+        return 0
+    positions = {item_id: (i + 1) * GAP for i, item_id in enumerate(ids)}
+    return db.session.execute(
+        update(model)
+        .where(model.production_id == production_id, model.id.in_(ids))
+        .values(order_index=case(positions, value=model.id), **values)
+        .execution_options(synchronize_session=False)).rowcount
+
+
+def renumber(model, production_id, act=None):
+    """Re-space every item of one list (after a gap runs out or a legacy import)."""
+    ids = db.session.execute(select(model.id).where(*_scope(model, production_id, act))
+                             .order_by(model.order_index, model.id)).scalars().all()
+    write_order(model, production_id, ids)
+
+
+def _index_after(model, item, after_id, act):
+    """order_index placing `item` right after `after_id` (None = first), or None if there is no gap."""
+    scope = _scope(model, item.production_id, act) + [model.id != item.id]
+    if after_id is None:
+        first = db.session.execute(select(func.min(model.order_index)).where(*scope)).scalar()
+        return GAP if first is None else first - GAP
+    prev = db.session.execute(select(model.order_index).where(*scope, model.id == after_id)).scalar()
+    if prev is None:
+        raise LookupError(after_id)
+    nxt = db.session.execute(select(model.order_index).where(*scope, model.order_index >= prev,
+                                                             model.id != after_id)
+                             .order_by(model.order_index, model.id).limit(1)).scalar()
+    if nxt is None:
+        return prev + GAP
+    if nxt - prev < 2:
+        return None
+    return (prev + nxt) // 2
+
+
+def move(item, after_id=None, act=None):
+    """Move a Song or Role to just after `after_id` (None = to the top).
+
+    For songs, `act` moves the song into another act at the same time.
+    Usually rewrites only the moved row; renumbers the list first when the
+    neighbours are adjacent. Raises LookupError if `after_id` is not in the list.
+    """
+    model = type(item)
+    if model is Song:
+        act = act if act is not None else item.act
+    index = _index_after(model, item, after_id, act)
+    if index is None:
+        renumber(model, item.production_id, act)
+        index = _index_after(model, item, after_id, act)
+    values = {'order_index': index}
+    if model is Song:
+        values['act'] = act
+    db.session.execute(update(model).where(model.id == item.id).values(**values)
+                       .execution_options(synchronize_session=False))
+    return index
+
+
+def backfill():
+    """Space out lists whose items share an order_index (rows created before ordering existed).
+
+    Ties keep the order the pages used to show: songs by title, roles solo
+    before group and then by name. Lists that are already ordered are left alone.
+    """
+    for model, tiebreak in ((Song, (Song.title,)), (Role, (Role.is_group, Role.name))):
+        group = (model.production_id, model.act) if model is Song else (model.production_id,)
+        scopes = db.session.execute(
+            select(*group).group_by(*group)
+            .having(func.count() > func.count(func.distinct(func.coalesce(model.order_index, 0))))).all()
+        for scope in scopes:
+            conditions = [column == value for column, value in zip(group, scope)]
+            ids = db.session.execute(select(model.id).where(*conditions)
+                                     .order_by(func.coalesce(model.order_index, 0), *tiebreak, model.id)
+                                     ).scalars().all()
+            write_order(model, scope[0], ids)
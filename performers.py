@@ -0,0 +1,150 @@
+# performers.py
+"""Structured song performers and the precomputed per-student song table.
+
+Song.performers_text stays the free text directors type ("Ursula, Flotsam,
+Jetsam"). Whenever it is saved it is parsed against the production's role
+names into song_performers rows (song -> role); parts naming no role
+("Sailors") stay text only. A part matches a role with the same words,
+ignoring case and plurals, or failing that the one role whose name contains
+it or is contained in it ("Triton" -> "King Triton", "Sea Gulls" -> "Gulls").
+
+student_songs holds (student, role, song) for every student singing a song
+through one of their roles. Edits refresh it with one DELETE and one
+INSERT ... SELECT limited to the songs or roles they touched, so a student's
+rehearsal sheet (roles, songs, numbers per act) is one indexed query:
+student_sheet().
+"""
+
+import re
+
+from sqlalchemy import delete, insert, select
+
+from models import db, Production, Role, RoleAssignment, Song, SongPerformer, StudentSong
+
+SEPARATORS = re.compile(r'\s*(?:[,;&/+]|\band\b|\bwith\b)\s*', re.IGNORECASE)
+
+
+def _words(name):
+    words = re.findall(r"[a-z0-9]+", (name or '').lower())
+    # "Sea Creatures" matches "Sea Creature Ensemble"; keep short words and "-ss" endings ("Boss")
+    return tuple(w[:-1] if len(w) > 3 and w.endswith('s') and not w.endswith('ss') else w for w in words)
+
+
+def _contains(outer, inner):
+    n = len(inner)
+    return 0 < n <= len(outer) and any(outer[i:i + n] == inner for i in range(len(outer) - n + 1))
+
+
+def match_roles(text, roles):
+    """Role ids named in a performers string, in text order. `roles` is [(id, name)]."""
+    named = [(role_id, _words(name)) for role_id, name in roles]
+    found = []
+    for part in SEPARATORS.split(text or ''):
+        words = _words(part)
+        if not words:
+            continue
+        matches = [role_id for role_id, role_words in named if role_words == words]
+        if not matches:
+            matches = [role_id for role_id, role_words in named
+                       if _contains(role_words, words) or _contains(words, role_words)]
+        if len(matches) == 1 and matches[0] not in found:
+            found.append(matches[0])
+    return found
+
+
+def refresh(song_ids=None, role_ids=None):
+    """Recompute student_songs rows for the given songs and/or roles (lists or SELECTs of ids)."""
+    db.session.flush()
+    conditions = []
+    if song_ids is not None:
+        conditions.append(('song_id', song_ids))
+    if role_ids is not None:
+        conditions.append(('role_id', role_ids))
+    for column, ids in conditions:
+        db.session.execute(delete(StudentSong).where(getattr(StudentSong, column).in_(ids))
+                           .execution_options(synchronize_session=False))
+        db.session.execute(insert(StudentSong).from_select(
+            ['student_id', 'role_id', 'song_id'],
+            select(RoleAssignment.student_id, SongPerformer.role_id, SongPerformer.song_id)
+            .join(RoleAssignment, RoleAssignment.role_id == SongPerformer.role_id)
+            .where(getattr(SongPerformer, column).in_(ids))))
+
+
+def link_songs(song_ids=None, production_id=None):
+    """Re-parse performers_text of the given songs (or all songs of a production, or every song).
+
+    Rewrites their song_performers rows and refreshes student_songs for them.
+    """
+    stmt = select(Song.id, Song.production_id, Song.performers_text)
+    if song_ids is not None:
+        stmt = stmt.where(Song.id.in_(song_ids))
+    if production_id is not None:
+        stmt = stmt.where(Song.production_id == production_id)
+    db.session.flush()
+    songs = db.session.execute(stmt).all()
+    if not songs:
+        return 0
+    roles = {}
+    for role_id, pid, name in db.session.execute(
+            select(Role.id, Role.production_id, Role.name)
+            .where(Role.production_id.in_({pid for _, pid, _ in songs}))
+            .order_by(Role.order_index, Role.id)):
+        roles.setdefault(pid, []).append((role_id, name))
+    ids = [song_id for song_id, _, _ in songs]
+    links = [{'song_id': song_id, 'role_id': role_id}
+             for song_id, pid, text in songs for role_id in match_roles(text, roles.get(pid, []))]
+    db.session.execute(delete(SongPerformer).where(SongPerformer.song_id.in_(ids))
+                       .execution_options(synchronize_session=False))
+    if links:
+        db.session.execute(insert(SongPerformer), links)
+    refresh(song_ids=ids)
+    return len(links)
+
+
+def backfill():
+    """One-time parse of existing performers_text (a no-op once any song has performer rows)."""
+    if db.session.execute(select(SongPerformer.id).limit(1)).first() is None:
+        link_songs()
+
+
+def student_sheet(student_id):
+    """A student's rehearsal sheet: per production, their roles, the songs they are in and numbers per act.
+
+    [{'id', 'title', 'roles': [{'id', 'name', 'songs': [song ids]}],
+      'songs': [{'id', 'act', 'title', 'roles': [role names]}], 'numbers': {act: count}, 'total'}]
+    """
+    rows = db.session.execute(
+        select(Production.id, Production.title, Role.id, Role.name, Role.order_index,
+               Song.id, Song.act, Song.title)
+        .select_from(RoleAssignment)
+        .join(Role, Role.id == RoleAssignment.role_id)
+        .join(Production, Production.id == Role.production_id)
+        .outerjoin(StudentSong, (StudentSong.student_id == RoleAssignment.student_id)
+                   & (StudentSong.role_id == Role.id))
+        .outerjoin(Song, Song.id == StudentSong.song_id)
+        .where(RoleAssignment.student_id == student_id)
+        .order_by(Production.title, Production.id, Song.act, Song.order_index, Role.order_index, Role.id))
+    sheet, productions, billing = [], {}, {}
+    for pid, title, role_id, role_name, role_order, song_id, act, song_title in rows:
+        prod = productions.get(pid)
+        if prod is None:
+            prod = productions[pid] = {'id': pid, 'title': title, 'roles': {}, 'songs': {},
+                                       'numbers': {}, 'total': 0}
+            sheet.append(prod)
+        role = prod['roles'].get(role_id)
+        if role is None:
+            role = prod['roles'][role_id] = {'id': role_id, 'name': role_name, 'songs': []}
+            billing[role_id] = (role_order or 0, role_id)
+        if song_id is None:
+            continue
+        role['songs'].append(song_id)
+        song = prod['songs'].get(song_id)
+        if song is None:
+            song = prod['songs'][song_id] = {'id': song_id, 'act': act, 'title': song_title, 'roles': []}
+            prod['numbers'][act] = prod['numbers'].get(act, 0) + 1
+            prod['total'] += 1
+        song['roles'].append(role_name)
+    for prod in sheet:
+        prod['roles'] = sorted(prod['roles'].values(), key=lambda r: billing[r['id']])
+        prod['songs'] = list(prod['songs'].values())
+    return sheet
@@ -0,0 +1,66 @@
+# prefork.py
+"""Start-up work done once in the gunicorn master (preload_app), shared by every worker.
+
+gunicorn.conf.py imports the app in the master and calls warm() before any
+worker forks. warm() compiles every template, hashes the templates and
+static files, and serves the director pages once so that SQLAlchemy's
+compiled-statement cache and the URL map are built. It then closes the
+master's database connections and freezes the heap (gc.freeze), so the
+garbage collector does not touch those objects and the forked workers keep
+sharing their memory pages instead of copying them.
+
+after_fork() runs first thing in each worker. It drops any pooled
+connection the worker inherited without closing it, since the socket
+still belongs to the master.
+
+The page cache is not warmed here: a worker respawned later would
+inherit pages rendered when the master started.
+"""
+
+import gc
+import os
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from assets import file_hash
+from cache import template_fingerprint
+from instrumentation import instrumentation
+from models import Production
+
+
+def _engines(app):
+    with app.app_context():
+        return list(db.engines.values())
+
+
+def warm(app):
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    with app.app_context():
+        template_fingerprint()
+        for root, dirs, files in os.walk(app.static_folder):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != app.config['UPLOAD_FOLDER']]
+            for name in files:
+                file_hash(os.path.join(root, name))
+        try:
+            first = db.session.execute(select(Production.id).order_by(Production.id).limit(1)).scalar()
+        except SQLAlchemyError:  # not initialised yet (`flask --app app init-db`)
+            app.logger.warning('preload: database not ready, skipping warm-up requests')
+            first = None
+        db.session.remove()
+    if first is not None:
+        client = app.test_client()
+        for url in ('/', '/director', f'/view/production/{first}'):
+            client.get(url)
+    instrumentation.reset()
+    for engine in _engines(app):
+        engine.dispose()
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork(app):
+    for engine in _engines(app):
+        engine.dispose(close=False)
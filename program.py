@@ -0,0 +1,240 @@
+# program.py
+"""Printable program (playbill) PDFs.
+
+A production's program is rendered by reportlab on a background worker pool
+from plain data (no ORM objects or app context), and stored as
+``<production id>-<content hash>.pdf`` in PROGRAM_FOLDER. The hash covers
+everything printed plus LAYOUT_VERSION, so a download is a file send until
+the printed content actually changes; bumping LAYOUT_VERSION invalidates
+every stored program.
+
+reportlab is optional: without it program_pdf() reports the export as
+unavailable.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, Production
+from snapshot import load_production_snapshot
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import (Image, KeepTogether, PageBreak, Paragraph, SimpleDocTemplate,
+                                    Spacer, Table, TableStyle)
+except ImportError:  # pragma: no cover - reportlab not installed
+    SimpleDocTemplate = None
+
+LAYOUT_VERSION = 1
+ACT_NAMES = {1: 'Act One', 2: 'Act Two', 3: 'Act Three'}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = {}  # pdf path -> Future of the job writing it
+_fingerprints = {}  # production id -> (revision, data, digest)
+
+
+def available():
+    return SimpleDocTemplate is not None
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = current_app.config.get('PROGRAM_WORKERS', 2)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='program-pdf')
+        return _executor
+
+
+def _cover_path(cover_url):
+    """Filesystem path of the best printable cover image, or None."""
+    if not cover_url:
+        return None
+    if cover_url.startswith('/uploads/'):
+        folder, name = current_app.config['UPLOAD_FOLDER'], cover_url[len('/uploads/'):]
+        stem = name.rsplit('.', 1)[0]
+        variant = os.path.join(folder, f'{stem}-900.jpg')  # see images.VARIANT_WIDTHS
+        path = variant if os.path.isfile(variant) else os.path.join(folder, name)
+    elif cover_url.startswith('/static/'):
+        path = os.path.join(current_app.static_folder, cover_url[len('/static/'):])
+    else:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def program_data(production_id):
+    """Everything printed in the program, as JSON-serializable plain data."""
+    snapshot = load_production_snapshot(production_id)
+    prod = snapshot['production']
+    return {
+        'id': prod.id,
+        'title': prod.title,
+        'subtitle': prod.subtitle,
+        'dates': prod.dates_text,
+        'location': prod.location,
+        'price': prod.price,
+        'copyright': prod.copyright,
+        'notes': prod.notes,
+        'cover': _cover_path(prod.cover_filename),
+        'team': [(t.position, t.name) for t in snapshot['team']],
+        'cast': [(r['role'], r['students']) for r in snapshot['cast']],
+        'songs': [(s.act or 0, s.title, s.performers_text) for s in snapshot['songs']],
+        'crew': [(c.student.full_name(), c.responsibility or 'Crew') for c in snapshot['crew']],
+        'thanks': [t.text for t in snapshot['thanks']],
+    }
+
+
+def content_hash(data):
+    digest = hashlib.sha256(json.dumps([LAYOUT_VERSION, data], sort_keys=True).encode())
+    if data['cover']:
+        with open(data['cover'], 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()[:20]
+
+
+def _fingerprint(production_id):
+    """(data, hash) for a production; reloaded only when its revision moves."""
+    revision = db.session.execute(select(Production.revision).where(Production.id == production_id)).scalar()
+    cached = _fingerprints.get(production_id)
+    if cached and revision is not None and cached[0] == revision:
+        return cached[1], cached[2]
+    data = program_data(production_id)  # 404s for unknown ids
+    digest = content_hash(data)
+    _fingerprints[production_id] = (revision, data, digest)
+    return data, digest
+
+
+def program_pdf(production_id):
+    """Return (folder, filename, future) for a production's program.
+
+    future is None when the PDF is already on disk; otherwise it is the
+    (shared) background job that will write it.
+    """
+    folder = current_app.config['PROGRAM_FOLDER']
+    data, digest = _fingerprint(production_id)
+    filename = f'{production_id}-{digest}.pdf'
+    path = os.path.join(folder, filename)
+    if os.path.isfile(path):
+        return folder, filename, None
+    pool = _pool()
+    with _executor_lock:  # lookup and submit together, so concurrent requests share one job
+        future = _pending.get(path)
+        submitted = future is None
+        if submitted:
+            future = _pending[path] = pool.submit(write_program, data, path)
+    if submitted:  # outside the lock: the callback runs here if the job already finished
+        future.add_done_callback(lambda f: _forget(path, f))
+    return folder, filename, future
+
+
+def _forget(path, future):
+    with _executor_lock:
+        if _pending.get(path) is future:
+            del _pending[path]
+
+
+def write_program(data, path):
+    """Render `data` to `path` atomically and drop older programs of the same production."""
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    tmp = f'{path}.{threading.get_ident()}.tmp'
+    render_program(data, tmp)
+    os.replace(tmp, path)
+    for old in glob.glob(os.path.join(folder, f'{data["id"]}-*.pdf')):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path
+
+
+def _styles():
+    sheet = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle('ProgramTitle', parent=sheet['Title'], fontSize=30, leading=36),
+        'subtitle': ParagraphStyle('ProgramSubtitle', parent=sheet['Heading2'], alignment=TA_CENTER),
+        'center': ParagraphStyle('ProgramCenter', parent=sheet['Normal'], alignment=TA_CENTER,
+                                 fontSize=11, leading=15),
+        'small': ParagraphStyle('ProgramSmall', parent=sheet['Normal'], alignment=TA_CENTER,
+                                fontSize=8, leading=10, textColor=colors.grey),
+        'heading': ParagraphStyle('ProgramHeading', parent=sheet['Heading1'], alignment=TA_CENTER,
+                                  spaceBefore=14, spaceAfter=8),
+        'act': ParagraphStyle('ProgramAct', parent=sheet['Heading3'], alignment=TA_CENTER),
+        'body': ParagraphStyle('ProgramBody', parent=sheet['Normal'], fontSize=10, leading=13),
+    }
+
+
+def _pairs(rows, style):
+    """Two-column (label, text) table; long tables split across pages."""
+    table = Table([[Paragraph(f'<b>{escape(a or "")}</b>', style), Paragraph(escape(b or ''), style)]
+                   for a, b in rows],
+                  colWidths=[2.6 * inch, 4.0 * inch])
+    table.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                               ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+                               ('BOTTOMPADDING', (0, 0), (-1, -1), 3)]))
+    return table
+
+
+def render_program(data, target):
+    """Lay out cover, team, cast, songs by act, crew and thanks into a letter-size PDF."""
+    st = _styles()
+    doc = SimpleDocTemplate(target, pagesize=letter, title=data['title'] or 'Program',
+                            leftMargin=0.9 * inch, rightMargin=0.9 * inch,
+                            topMargin=0.8 * inch, bottomMargin=0.8 * inch)
+    story = []
+    if data['subtitle']:
+        story.append(Paragraph(escape(data['subtitle']), st['subtitle']))
+    story.append(Paragraph(escape(data['title'] or ''), st['title']))
+    if data['cover']:
+        try:
+            img = Image(data['cover'])
+            scale = min(5.5 * inch / img.imageWidth, 6.2 * inch / img.imageHeight)
+            img.drawWidth, img.drawHeight = img.imageWidth * scale, img.imageHeight * scale
+            story += [Spacer(1, 12), img]
+        except (OSError, ValueError):
+            pass  # unreadable cover: print the program without it
+    story.append(Spacer(1, 18))
+    for line in (data['dates'], data['location'], data['price'] and f'Admission: {data["price"]}'):
+        if line:
+            story.append(Paragraph(escape(line), st['center']))
+    if data['notes']:
+        story += [Spacer(1, 12), Paragraph(f'<i>{escape(data["notes"])}</i>', st['center'])]
+    if data['copyright']:
+        story += [Spacer(1, 12), Paragraph(escape(data['copyright']), st['small'])]
+    story.append(PageBreak())
+
+    if data['team']:
+        story += [Paragraph('Creative Team', st['heading']), _pairs(data['team'], st['body'])]
+    if data['cast']:
+        story += [Paragraph('Cast', st['heading']),
+                  _pairs([(role, ', '.join(names) or '—') for role, names in data['cast']], st['body'])]
+    if data['songs']:
+        story.append(Paragraph('Musical Numbers', st['heading']))
+        by_act = {}
+        for act, title, performers in data['songs']:
+            by_act.setdefault(act, []).append((title, performers or ''))
+        for act, songs in by_act.items():
+            block = [Paragraph(ACT_NAMES.get(act, f'Act {act}'), st['act']), _pairs(songs, st['body'])]
+            # keep a short act on one page with its heading; a long one just flows
+            story += [KeepTogether(block)] if len(songs) < 25 else block
+    if data['crew']:
+        story += [Paragraph('Crew', st['heading']),
+                  _pairs([(resp, name) for name, resp in data['crew']], st['body'])]
+    if data['thanks']:
+        story.append(Paragraph('Special Thanks', st['heading']))
+        story += [Paragraph(escape(text), st['center']) for text in data['thanks']]
+    doc.build(story)
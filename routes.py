@@ -1,30 +1,86 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_from_directory, current_app
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, abort
 from models import db, Student, Production, Role, RoleAssignment, CrewAssignment, TeamMember, Song, Thanks
-from werkzeug.utils import secure_filename
-import os, csv
+from snapshot import load_production_snapshot
+from importer import import_students as import_student_rows
+from archive import (ArchiveError, archive_productions, delete_productions, dump_archive, export_production,
+                     import_production as import_archive, load_archives)
+from images import save_cover
+from assets import send_asset, upload_view
+import ordering
+import performers
+import program
+import live
+import static_site
+from cache import page_cache, cached_page, conditional_page, production_key, HOME_KEY
+from database import read_from_replica, remember_write
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 ALLOWED_EXT = {'png', 'jpg', 'jpeg', 'gif'}
 view_bp = Blueprint('view', __name__)
 edit_bp = Blueprint('edit', __name__)
-
-@view_bp.before_request
-def create_tables():
-    db.create_all()
+# viewer and director pages read from the replica when one is configured; edits write to the primary
+view_bp.before_request(read_from_replica)
+edit_bp.before_request(remember_write)
+
+def commit_production_change(production_id, listing=False):
+    """Commit an edit to a production: bump its revision and drop its cached pages.
+
+    Pass listing=True when the change is visible in the production lists
+    (title, subtitle, cover, create/delete).
+    """
+    db.session.execute(update(Production).where(Production.id == production_id)
+                       .values(revision=Production.revision + 1))
+    db.session.commit()
+    page_cache.invalidate(production_id, listing=listing)
+    live.notify(production_id)
+    static_site.schedule()
+
+def productions_removed(production_ids):
+    """After committing the deletion of productions: the post-commit hooks of commit_production_change."""
+    for production_id in production_ids:
+        page_cache.invalidate(production_id, listing=True)
+        live.notify(production_id)
+    static_site.schedule()
+
+def refresh_when_ready(variants, production_id):
+    """Re-render a production's pages once its cover variants have been generated."""
+    if variants is None:
+        return
+    app = current_app._get_current_object()
+
+    def done(future):
+        if future.exception() is not None:
+            app.logger.warning('cover variants for production %s failed: %s', production_id, future.exception())
+            return
+        with app.app_context():
+            commit_production_change(production_id, listing=True)
+    variants.add_done_callback(done)
+
+# the lists show title/subtitle/cover, so their ETag covers exactly those columns
+LISTING_ETAG_QUERY = (select(Production.id, Production.revision, Production.title,
+                             Production.subtitle, Production.cover_filename)
+                      .order_by(Production.id))
+
+def listing_etag():
+    return repr(db.session.execute(LISTING_ETAG_QUERY).all())
+
+def production_etag(production_id):
+    revision = db.session.execute(select(Production.revision).where(Production.id == production_id)).scalar()
+    return f'{production_id}:{revision}'
+
+def director_production_etag(production_id):
+    # the director page also lists every production in its navigation
+    return f'{production_etag(production_id)}:{listing_etag()}'
 
 def allowed_file(f):
     return '.' in f and f.rsplit('.', 1)[1].lower() in ALLOWED_EXT
 
-def import_students_from_csv(filepath):
-    try:
-        with open(filepath, 'r') as f:
-            for row in csv.DictReader(f):
-                if not Student.query.filter_by(name=row['name']).first():
-                    db.session.add(Student(name=row['name'], sex=row.get('sex', ''), year=row.get('year', '')))
-        db.session.commit()
-    except FileNotFoundError:
-        pass
-
-
 # VIEWER ROUTES
 @view_bp.route('/')
 def home():
@@ -32,69 +88,95 @@ def home():
 
 
 @view_bp.route('/viewer')
+@conditional_page(listing_etag)
+@cached_page(lambda: HOME_KEY, etag_fn=listing_etag)
 def viewer_home():
     prods = Production.query.order_by(Production.title).all()
     return render_template('viewer.jinja', productions=prods)
 
 
 @view_bp.route('/viewer/production/<int:production_id>')
+@conditional_page(production_etag)
+@cached_page(production_key, etag_fn=production_etag)
 def viewer_production(production_id):
-    prod = Production.query.get_or_404(production_id)
-    roles = Role.query.filter_by(production_id=prod.id).order_by(Role.is_group, Role.name).all()
-    cast = [{'role': r.name, 'students': [a.student.full_name() for a in r.assignments]} for r in roles]
-    crew = CrewAssignment.query.filter_by(production_id=prod.id).all()
-    team = TeamMember.query.filter_by(production_id=prod.id).all()
-    songs = Song.query.filter_by(production_id=prod.id).order_by(Song.act, Song.title).all()
-    thanks = Thanks.query.filter_by(production_id=prod.id).all()
-    return render_template('viewer_production.jinja', production=prod, cast=cast, crew=crew, team=team, songs=songs, thanks=thanks)
+    return render_template('viewer_production.jinja', **load_production_snapshot(production_id))
 
 
 # DIRECTOR ROUTES
 @view_bp.route('/director')
+@conditional_page(listing_etag)
 def director_home():
     prods = Production.query.order_by(Production.title).all()
     return render_template('production.jinja', production=None, productions=prods)
 
 
 @view_bp.route('/view/production/<int:production_id>')
+@conditional_page(director_production_etag)
 def view_production(production_id):
-    prod = Production.query.get_or_404(production_id)
-    roles = Role.query.filter_by(production_id=prod.id).order_by(Role.is_group, Role.name).all()
-    cast = [{'role': r.name, 'students': [a.student.full_name() for a in r.assignments]} for r in roles]
-    crew = CrewAssignment.query.filter_by(production_id=prod.id).all()
-    team = TeamMember.query.filter_by(production_id=prod.id).all()
-    songs = Song.query.filter_by(production_id=prod.id).order_by(Song.act, Song.title).all()
-    thanks = Thanks.query.filter_by(production_id=prod.id).all()
-    return render_template('production.jinja', production=prod, cast=cast, crew=crew, team=team, songs=songs, thanks=thanks, productions=Production.query.order_by(Production.title).all())
+    snapshot = load_production_snapshot(production_id)
+    return render_template('production.jinja', productions=Production.query.order_by(Production.title).all(), **snapshot)
 
 
 @view_bp.route('/view/production/<int:production_id>/cast')
 def view_cast(production_id):
-    prod = Production.query.get_or_404(production_id)
-    roles = Role.query.filter_by(production_id=prod.id).order_by(Role.is_group, Role.name).all()
-    cast = [{'id': r.id, 'role': r.name, 'students': [a.student.full_name() for a in r.assignments]} for r in roles]
-    students = sorted(Student.query.all(), key=lambda s: s.name)
-    return render_template('cast.jinja', production=prod, cast=cast, students=students)
+    snapshot = load_production_snapshot(production_id)
+    return render_template('cast.jinja', production=snapshot['production'], cast=snapshot['cast'])
 
 
 @view_bp.route('/view/production/<int:production_id>/crew')
 def view_crew(production_id):
     prod = Production.query.get_or_404(production_id)
-    crew = CrewAssignment.query.filter_by(production_id=prod.id).all()
-    students = sorted(Student.query.all(), key=lambda s: s.name)
-    return render_template('crew.jinja', production=prod, crew=crew, students=students)
+    crew = (CrewAssignment.query.options(joinedload(CrewAssignment.student))
+            .filter_by(production_id=prod.id).order_by(CrewAssignment.id).all())
+    return render_template('crew.jinja', production=prod, crew=crew)
 
 
 @view_bp.route('/view/production/<int:production_id>/songs')
 def view_songs(production_id):
     prod = Production.query.get_or_404(production_id)
-    songs = Song.query.filter_by(production_id=prod.id).order_by(Song.act, Song.title).all()
+    songs = Song.query.filter_by(production_id=prod.id).order_by(Song.act, Song.order_index, Song.id).all()
     return render_template('songs.jinja', production=prod, songs=songs)
 
 
+@view_bp.route('/view/student/<int:student_id>')
+def student_sheet(student_id):
+    student = Student.query.get_or_404(student_id)
+    return render_template('student_sheet.jinja', student=student, sheet=performers.student_sheet(student_id))
+
+
+@view_bp.route('/viewer/production/<int:production_id>/program.pdf')
+def program_pdf(production_id):
+    if not program.available():
+        abort(501, 'PDF export needs reportlab installed')
+    folder, filename, job = program.program_pdf(production_id)
+    if job is not None:
+        try:
+            job.result(timeout=current_app.config['PROGRAM_WAIT'])
+        except FutureTimeout:
+            resp = current_app.response_class(
+                render_template('program_pending.jinja', production_id=production_id), status=202)
+            resp.headers['Retry-After'] = '3'
+            resp.headers['Refresh'] = '3'
+            return resp
+        except Exception as exc:  # the next request submits a fresh job
+            current_app.logger.warning('program PDF for production %s failed: %s', production_id, exc)
+            resp = current_app.response_class('The program could not be generated, please try again later.',
+                                              status=503, mimetype='text/plain')
+            resp.headers['Retry-After'] = '30'
+            return resp
+    resp = send_asset(folder, filename)
+    resp.headers['Content-Disposition'] = f'inline; filename="program-{production_id}.pdf"'
+    return resp
+
+
+@view_bp.route('/viewer/cache-stats')
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+
 @view_bp.route('/uploads/<path:filename>')
 def uploads(filename):
-    return send_from_directory(os.path.join(current_app.root_path, 'static/uploads'), filename)
+    return upload_view(filename)
 
 
 # EDIT ROUTES
@@ -108,13 +190,13 @@ def create_production():
                    price=request.form.get('price', ''), copyright=request.form.get('copyright', ''),
                    notes=request.form.get('notes', ''), dates_text=request.form.get('dates', ''))
     file = request.files.get('cover')
+    variants = None
     if file and allowed_file(file.filename):
-        fname = secure_filename(file.filename)
-        os.makedirs(os.path.join(current_app.root_path, 'static/uploads'), exist_ok=True)
-        file.save(os.path.join(current_app.root_path, 'static/uploads', fname))
-        p.cover_filename = f'/uploads/{fname}'
+        p.cover_filename, variants = save_cover(file, current_app.config['UPLOAD_FOLDER'])
     db.session.add(p)
-    db.session.commit()
+    db.session.flush()
+    commit_production_change(p.id, listing=True)
+    refresh_when_ready(variants, p.id)
     flash('Production created', 'success')
     return redirect(url_for('view.view_production', production_id=p.id))
 
@@ -131,12 +213,11 @@ def edit_production(production_id):
         p.notes = request.form.get('notes', '')
         p.dates_text = request.form.get('dates', '')
         file = request.files.get('cover')
+        variants = None
         if file and allowed_file(file.filename):
-            fname = secure_filename(file.filename)
-            os.makedirs(os.path.join(current_app.root_path, 'static/uploads'), exist_ok=True)
-            file.save(os.path.join(current_app.root_path, 'static/uploads', fname))
-            p.cover_filename = f'/uploads/{fname}'
-        db.session.commit()
+            p.cover_filename, variants = save_cover(file, current_app.config['UPLOAD_FOLDER'])
+        commit_production_change(p.id, listing=True)
+        refresh_when_ready(variants, p.id)
         flash('Production updated', 'success')
         return redirect(url_for('view.view_production', production_id=p.id))
     return render_template('production_edit.jinja', production=p)
@@ -144,33 +225,49 @@ def edit_production(production_id):
 
 @edit_bp.route('/production/<int:production_id>/delete', methods=['POST'])
 def delete_production(production_id):
-    p = Production.query.get_or_404(production_id)
-    try:
-        Thanks.query.filter_by(production_id=production_id).delete()
-    except:
-        pass
-    db.session.delete(p)
-    db.session.commit()
+    if not delete_productions([production_id]):
+        abort(404)
+    commit_production_change(production_id, listing=True)
     flash('Production deleted', 'success')
     return redirect(url_for('view.director_home'))
 
 
+def _known_student(value):
+    """The id of an existing student from a form value, or None (foreign keys are enforced)."""
+    try:
+        student_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return db.session.execute(select(Student.id).where(Student.id == student_id)).scalar()
+
+
 @edit_bp.route('/production/<int:production_id>/cast', methods=['POST'])
 def add_role_assignment(production_id):
+    Production.query.get_or_404(production_id)
     student_id = request.form.get('student_id')
     role_name = request.form.get('role', '').strip()
     is_group = bool(request.form.get('is_group'))
     if not role_name or not student_id:
         flash('Role and student required', 'error')
         return redirect(url_for('view.view_cast', production_id=production_id))
+    student_id = _known_student(student_id)
+    if student_id is None:
+        flash('Unknown student', 'error')
+        return redirect(url_for('view.view_cast', production_id=production_id))
     role = Role.query.filter_by(production_id=production_id, name=role_name, is_group=is_group).first()
-    if not role:
-        role = Role(production_id=production_id, name=role_name, is_group=is_group)
+    created = role is None
+    if created:
+        role = Role(production_id=production_id, name=role_name, is_group=is_group,
+                    order_index=ordering.next_index(Role, production_id))
         db.session.add(role)
         db.session.flush()
-    assign = RoleAssignment(role_id=role.id, student_id=int(student_id))
+    if RoleAssignment.query.filter_by(role_id=role.id, student_id=student_id).first():
+        flash('Student already has that role', 'error')
+        return redirect(url_for('view.view_cast', production_id=production_id))
+    assign = RoleAssignment(role_id=role.id, student_id=student_id)
     db.session.add(assign)
-    db.session.commit()
+    _refresh_performers(production_id, role, created)
+    commit_production_change(production_id)
     flash('Assigned', 'success')
     return redirect(url_for('view.view_cast', production_id=production_id))
 
@@ -180,21 +277,197 @@ def delete_role_assignment(assign_id):
     ra = RoleAssignment.query.get_or_404(assign_id)
     pid = ra.role.production_id
     db.session.delete(ra)
-    db.session.commit()
+    performers.refresh(role_ids=[ra.role_id])
+    commit_production_change(pid)
     flash('Removed', 'success')
     return redirect(url_for('view.view_cast', production_id=pid))
 
 
+def _refresh_performers(production_id, role, created):
+    # a new role may be named in songs entered before it existed, so re-parse them
+    if created:
+        performers.link_songs(production_id=production_id)
+    else:
+        performers.refresh(role_ids=[role.id])
+
+
+def _id_list(values):
+    """Unique ints from a list of ids / comma-separated strings (or a single such string)."""
+    if isinstance(values, str):
+        values = [values]
+    ids = []
+    for value in values:
+        for part in str(value).split(','):
+            if part.strip().isdigit():
+                ids.append(int(part))
+    return list(dict.fromkeys(ids))
+
+
+def _bulk_params():
+    """Bulk routes accept a JSON body or a form with repeated / comma-separated id fields.
+
+    Returns (params, wants_json); params is None for a JSON body that is not
+    an object or whose id fields are not a list or a string.
+    """
+    data = request.get_json(silent=True)
+    if data is not None:
+        valid = isinstance(data, dict) and all(isinstance(data.get(field, []), (list, str))
+                                               for field in ('student_ids', 'assignment_ids'))
+        return (data if valid else None), True
+    form = request.form
+    return {'role': form.get('role', ''), 'is_group': bool(form.get('is_group')),
+            'student_ids': form.getlist('student_id') + form.getlist('student_ids'),
+            'assignment_ids': form.getlist('assign_id') + form.getlist('assignment_ids')}, False
+
+
+@edit_bp.route('/production/<int:production_id>/cast/bulk', methods=['POST'])
+def add_role_assignments_bulk(production_id):
+    """Assign many students to one role in a single transaction."""
+    Production.query.get_or_404(production_id)
+    params, wants_json = _bulk_params()
+    if params is None:
+        return jsonify(error='expected a JSON object with a list of ids'), 400
+    role_name = str(params.get('role') or '').strip()
+    is_group = bool(params.get('is_group'))
+    student_ids = _id_list(params.get('student_ids') or [])
+    if not role_name or not student_ids:
+        if wants_json:
+            return jsonify(error='role and student_ids required'), 400
+        flash('Role and at least one student required', 'error')
+        return redirect(url_for('view.view_cast', production_id=production_id))
+
+    role = Role.query.filter_by(production_id=production_id, name=role_name, is_group=is_group).first()
+    created = role is None
+    if created:
+        role = Role(production_id=production_id, name=role_name, is_group=is_group,
+                    order_index=ordering.next_index(Role, production_id))
+        db.session.add(role)
+        db.session.flush()
+    known = set(db.session.execute(select(Student.id).where(Student.id.in_(student_ids))).scalars())
+    assigned = set(db.session.execute(select(RoleAssignment.student_id)
+                                      .where(RoleAssignment.role_id == role.id)).scalars())
+    new_ids = [sid for sid in student_ids if sid in known and sid not in assigned]
+    try:
+        if new_ids:
+            db.session.execute(insert(RoleAssignment), [{'role_id': role.id, 'student_id': sid} for sid in new_ids])
+        if new_ids or created:
+            _refresh_performers(production_id, role, created)
+        commit_production_change(production_id)
+    except IntegrityError:  # a student was deleted since `known` was read
+        db.session.rollback()
+        if wants_json:
+            return jsonify(error='unknown student'), 400
+        flash('Unknown student', 'error')
+        return redirect(url_for('view.view_cast', production_id=production_id))
+
+    summary = {'role_id': role.id, 'added': len(new_ids),
+               'already_assigned': len([sid for sid in student_ids if sid in assigned]),
+               'unknown': len([sid for sid in student_ids if sid not in known])}
+    if wants_json:
+        return jsonify(summary)
+    flash(f"Assigned {summary['added']} to {role_name}"
+          f" ({summary['already_assigned']} already assigned, {summary['unknown']} unknown)", 'success')
+    return redirect(url_for('view.view_cast', production_id=production_id))
+
+
+@edit_bp.route('/production/<int:production_id>/cast/bulk_delete', methods=['POST'])
+def delete_role_assignments_bulk(production_id):
+    """Remove many role assignments of one production in a single statement."""
+    Production.query.get_or_404(production_id)
+    params, wants_json = _bulk_params()
+    if params is None:
+        return jsonify(error='expected a JSON object with a list of ids'), 400
+    assignment_ids = _id_list(params.get('assignment_ids') or [])
+    removed = 0
+    if assignment_ids:
+        roles = select(Role.id).where(Role.production_id == production_id)
+        removed = db.session.execute(
+            delete(RoleAssignment)
+            .where(RoleAssignment.id.in_(assignment_ids), RoleAssignment.role_id.in_(roles))
+            .execution_options(synchronize_session=False)).rowcount
+    if removed:
+        performers.refresh(role_ids=roles)
+        commit_production_change(production_id)
+    if wants_json:
+        return jsonify(removed=removed)
+    flash(f'Removed {removed} assignment(s)', 'success')
+    return redirect(url_for('view.view_cast', production_id=production_id))
+
+
+def _order_body():
+    """The reorder routes' JSON body, or None unless it is an object whose "order" (if any) is a list of ids."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('order', []), (list, str)):
+        return None
+    return data
+
+
+def _full_order(model, production_id, ids):
+    """True if `ids` lists every item of the production exactly once."""
+    existing = set(db.session.execute(select(model.id).where(model.production_id == production_id)).scalars())
+    return len(ids) == len(existing) and set(ids) == existing
+
+
+def _move(item):
+    """Shared body of the single-item move routes: JSON or form {"after": id or null[, "act": n]}."""
+    params = request.get_json(silent=True)
+    if params is None:
+        params = request.form
+    elif not isinstance(params, dict):
+        return jsonify(error='expected a JSON object'), 400
+    after, act = params.get('after'), params.get('act')
+    if act in (None, ''):
+        act = None
+    elif not str(act).isdigit() or int(act) < 1:
+        return jsonify(error='act must be a positive act number'), 400
+    else:
+        act = int(act)
+    try:
+        index = ordering.move(item, int(after) if after not in (None, '') else None, act)
+    except (LookupError, TypeError, ValueError):
+        db.session.rollback()
+        return jsonify(error='after must be another item of the same list'), 400
+    item_id, production_id = item.id, item.production_id
+    commit_production_change(production_id)
+    return jsonify(id=item_id, order_index=index)
+
+
+@edit_bp.route('/production/<int:production_id>/cast/order', methods=['POST'])
+def reorder_cast(production_id):
+    """Set the whole role order at once: {"order": [role ids]} (one UPDATE)."""
+    Production.query.get_or_404(production_id)
+    data = _order_body()
+    if data is None:
+        return jsonify(error='expected a JSON object {"order": [role ids]}'), 400
+    ids = _id_list(data.get('order') or [])
+    if not _full_order(Role, production_id, ids):
+        return jsonify(error='order must list every role of the production exactly once'), 400
+    updated = ordering.write_order(Role, production_id, ids)
+    commit_production_change(production_id)
+    return jsonify(updated=updated)
+
+
+@edit_bp.route('/role/<int:role_id>/move', methods=['POST'])
+def move_role(role_id):
+    """Drag-and-drop: put one role right after another (usually a one-row UPDATE)."""
+    return _move(Role.query.get_or_404(role_id))
+
+
 @edit_bp.route('/production/<int:production_id>/crew', methods=['POST'])
 def add_crew(production_id):
+    Production.query.get_or_404(production_id)
     student_id = request.form.get('student_id')
     if not student_id:
         flash('Student required', 'error')
         return redirect(url_for('view.view_crew', production_id=production_id))
-    ca = CrewAssignment(production_id=production_id, student_id=int(student_id), 
+    student_id = _known_student(student_id)
+    if student_id is None:
+        flash('Unknown student', 'error')
+        return redirect(url_for('view.view_crew', production_id=production_id))
+    ca = CrewAssignment(production_id=production_id, student_id=student_id, 
                         responsibility=request.form.get('responsibility', 'Crew'))
     db.session.add(ca)
-    db.session.commit()
+    commit_production_change(production_id)
     flash('Crew added', 'success')
     return redirect(url_for('view.view_crew', production_id=production_id))
 
@@ -204,21 +477,25 @@ def delete_crew(crew_id):
     c = CrewAssignment.query.get_or_404(crew_id)
     pid = c.production_id
     db.session.delete(c)
-    db.session.commit()
+    commit_production_change(pid)
     flash('Removed', 'success')
     return redirect(url_for('view.view_crew', production_id=pid))
 
 
 @edit_bp.route('/production/<int:production_id>/songs', methods=['POST'])
 def add_song(production_id):
+    Production.query.get_or_404(production_id)
     title = request.form.get('title', '').strip()
     if not title:
         flash('Title required', 'error')
         return redirect(url_for('view.view_songs', production_id=production_id))
+    act = int(request.form.get('act', 1))
     s = Song(production_id=production_id, title=title, performers_text=request.form.get('performers', ''),
-             act=int(request.form.get('act', 1)))
+             act=act, order_index=ordering.next_index(Song, production_id, act))
     db.session.add(s)
-    db.session.commit()
+    db.session.flush()
+    performers.link_songs([s.id])
+    commit_production_change(production_id)
     flash('Song added', 'success')
     return redirect(url_for('view.view_songs', production_id=production_id))
 
@@ -228,8 +505,11 @@ def edit_song(song_id):
     s = Song.query.get_or_404(song_id)
     s.title = request.form.get('title', s.title)
     s.performers_text = request.form.get('performers', '')
-    s.act = int(request.form.get('act', s.act))
-    db.session.commit()
+    act = int(request.form.get('act', s.act))
+    if act != s.act:  # to the end of its new act
+        s.act, s.order_index = act, ordering.next_index(Song, s.production_id, act)
+    performers.link_songs([s.id])
+    commit_production_change(s.production_id)
     flash('Updated', 'success')
     return redirect(url_for('view.view_songs', production_id=s.production_id))
 
@@ -239,13 +519,50 @@ def delete_song(song_id):
     s = Song.query.get_or_404(song_id)
     pid = s.production_id
     db.session.delete(s)
-    db.session.commit()
+    commit_production_change(pid)
     flash('Removed', 'success')
     return redirect(url_for('view.view_songs', production_id=pid))
 
 
+@edit_bp.route('/production/<int:production_id>/songs/order', methods=['POST'])
+def reorder_songs(production_id):
+    """Set the whole running order at once (one UPDATE).
+
+    {"acts": {"1": [song ids], "2": [...]}} also moves songs between acts;
+    {"order": [song ids]} keeps every song in its act.
+    """
+    Production.query.get_or_404(production_id)
+    data = _order_body()
+    if data is None:
+        return jsonify(error='expected a JSON object {"order": [song ids]} or {"acts": {...}}'), 400
+    values = {}
+    if isinstance(data.get('acts'), dict):
+        try:
+            acts = sorted((int(act), _id_list(ids)) for act, ids in data['acts'].items())
+        except (TypeError, ValueError):
+            return jsonify(error='acts must map act numbers to lists of song ids'), 400
+        if any(act < 1 for act, _ in acts):
+            return jsonify(error='act must be a positive act number'), 400
+        ids = [song_id for _, act_ids in acts for song_id in act_ids]
+        values['act'] = case({song_id: act for act, act_ids in acts for song_id in act_ids}, value=Song.id)
+    else:
+        ids = _id_list(data.get('order') or [])
+    if len(set(ids)) != len(ids) or not _full_order(Song, production_id, ids):
+        return jsonify(error='order must list every song of the production exactly once'), 400
+    updated = ordering.write_order(Song, production_id, ids, **values)
+    commit_production_change(production_id)
+    return jsonify(updated=updated)
+
+
+@edit_bp.route('/song/<int:song_id>/move', methods=['POST'])
+def move_song(song_id):
+    """Drag-and-drop: put one song right after another, optionally in another act."""
+    return _move(Song.query.get_or_404(song_id))
+
+
 @edit_bp.route('/production/<int:production_id>/team', methods=['POST'])
 def add_team(production_id):
+    Production.query.get_or_404(production_id)
     name = request.form.get('name', '').strip()
     position = request.form.get('position', '').strip()
     if not name or not position:
@@ -253,7 +570,7 @@ def add_team(production_id):
         return redirect(url_for('view.view_production', production_id=production_id))
     tm = TeamMember(production_id=production_id, name=name, position=position)
     db.session.add(tm)
-    db.session.commit()
+    commit_production_change(production_id)
     flash('Added', 'success')
     return redirect(url_for('view.view_production', production_id=production_id))
 
@@ -263,20 +580,21 @@ def delete_team(tm_id):
     t = TeamMember.query.get_or_404(tm_id)
     pid = t.production_id
     db.session.delete(t)
-    db.session.commit()
+    commit_production_change(pid)
     flash('Removed', 'success')
     return redirect(url_for('view.view_production', production_id=pid))
 
 
 @edit_bp.route('/production/<int:production_id>/thanks', methods=['POST'])
 def add_thanks(production_id):
+    Production.query.get_or_404(production_id)
     text = request.form.get('text', '').strip()
     if not text:
         flash('Text required', 'error')
         return redirect(url_for('view.view_production', production_id=production_id))
     t = Thanks(production_id=production_id, text=text)
     db.session.add(t)
-    db.session.commit()
+    commit_production_change(production_id)
     flash('Added', 'success')
     return redirect(url_for('view.view_production', production_id=production_id))
 
@@ -286,20 +604,97 @@ def delete_thanks(thanks_id):
     t = Thanks.query.get_or_404(thanks_id)
     pid = t.production_id
     db.session.delete(t)
-    db.session.commit()
+    commit_production_change(pid)
     flash('Removed', 'success')
     return redirect(url_for('view.view_production', production_id=pid))
 
 
 @edit_bp.route('/import_students', methods=['POST'])
 def import_students():
+    # raw CSV bodies (e.g. curl --data-binary @roster.csv -H 'Content-Type: text/csv') get a JSON summary
+    if request.mimetype == 'text/csv':
+        summary = import_student_rows(request.stream)
+        return jsonify(summary), 400 if 'error' in summary else 200
     file = request.files.get('file')
     if not file or file.filename.split('.')[-1].lower() != 'csv':
         flash('CSV file required', 'error')
         return redirect(url_for('view.director_home'))
-    filepath = os.path.join(current_app.root_path, 'static/uploads', secure_filename(file.filename))
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    file.save(filepath)
-    import_students_from_csv(filepath)
-    flash('Students imported', 'success')
-    return redirect(url_for('view.director_home'))
\ No newline at end of file
+    summary = import_student_rows(file.stream)
+    if 'error' in summary:
+        flash(summary['error'], 'error')
+    else:
+        flash(f"Students imported: {summary['inserted']} added, {summary['skipped']} already listed, "
+              f"{summary['malformed']} malformed rows ({summary['seconds']:.2f}s)", 'success')
+    return redirect(url_for('view.director_home'))
+
+
+@edit_bp.route('/production/<int:production_id>/export')
+def export_production_archive(production_id):
+    archive = export_production(production_id, current_app.config['UPLOAD_FOLDER'])
+    if archive is None:
+        abort(404)
+    resp = current_app.response_class(dump_archive(archive), mimetype='application/json')
+    resp.headers['Content-Disposition'] = f'attachment; filename="production-{production_id}.json"'
+    return resp
+
+
+@edit_bp.route('/archive_season', methods=['POST'])
+def archive_season():
+    """Archive several productions at once: export them to one JSONL file, then delete them.
+
+    The archive is kept in ARCHIVE_FOLDER and sent back as a download; it can
+    be restored with the import form. Accepts repeated production_id form
+    fields or a JSON body {"production_ids": [...]}.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        ids = data.get('production_ids') if isinstance(data, dict) else None
+        ids = _id_list(ids) if isinstance(ids, (list, str)) else []
+        if not ids:
+            return jsonify(error='production_ids required'), 400
+    else:
+        ids = _id_list(request.form.getlist('production_id'))
+        if not ids:
+            flash('Select at least one production to archive', 'error')
+            return redirect(url_for('view.director_home'))
+    folder = current_app.config['ARCHIVE_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    filename = f'season-{time.strftime("%Y%m%d-%H%M%S")}.jsonl'
+    path = os.path.join(folder, filename)
+    with open(path, 'w', encoding='utf-8') as output:
+        archived = archive_productions(ids, output, current_app.config['UPLOAD_FOLDER'])
+    db.session.commit()
+    productions_removed(archived)
+    if not archived:
+        os.remove(path)
+        abort(404)
+    resp = send_asset(folder, filename)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return resp
+
+
+@edit_bp.route('/import_production', methods=['POST'])
+def import_production():
+    # a JSON / JSONL body gets a JSON summary; the director form uploads a file
+    as_json = request.mimetype in ('application/json', 'application/x-ndjson')
+    file = request.files.get('file')
+    try:
+        if not as_json and not file:
+            raise ArchiveError('Archive file required')
+        imported = [import_archive(archive, current_app.config['UPLOAD_FOLDER'])
+                    for archive in load_archives(request.stream if as_json else file.stream)]
+    except ArchiveError as exc:
+        db.session.rollback()
+        if as_json:
+            return jsonify({'error': str(exc)}), 400
+        flash(str(exc), 'error')
+        return redirect(url_for('view.director_home'))
+    for production_id, counts in imported:
+        commit_production_change(production_id, listing=True)
+        refresh_when_ready(counts.pop('cover_job'), production_id)
+    if as_json:
+        return jsonify([counts for _, counts in imported])
+    flash(f'Imported {len(imported)} production(s)', 'success')
+    if len(imported) == 1:
+        return redirect(url_for('view.view_production', production_id=imported[0][0]))
+    return redirect(url_for('view.director_home'))
@@ -0,0 +1,117 @@
+# search.py
+"""Student name search for the cast and crew pickers.
+
+On SQLite with FTS5 the students_fts table (an external-content index over
+students.name kept in sync by triggers, created by `flask init-db`) answers
+prefix queries. Otherwise a sorted in-memory index keyed on last name (and
+full name) is searched with bisect; it is rebuilt whenever the roster size
+or highest id changes.
+"""
+
+import bisect
+import re
+import threading
+
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Student
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5("
+    "name, content='students', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN "
+    "INSERT INTO students_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN "
+    "INSERT INTO students_fts(students_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF name ON students BEGIN "
+    "INSERT INTO students_fts(students_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO students_fts(rowid, name) VALUES (new.id, new.name); END",
+]
+
+
+def create_fts_index(conn):
+    """Create (or rebuild) the FTS5 index; returns False if SQLite lacks FTS5."""
+    if conn.dialect.name != 'sqlite':
+        return False
+    try:
+        for statement in FTS_DDL:
+            conn.execute(text(statement))
+    except OperationalError:
+        return False
+    conn.execute(text("INSERT INTO students_fts(students_fts) VALUES ('rebuild')"))
+    return True
+
+
+class MemoryIndex:
+    """Sorted (key, name, id) tuples searched by prefix with bisect."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature = None
+        self._keys = []
+
+    def _refresh(self):
+        signature = db.session.execute(select(func.count(Student.id), func.max(Student.id))).one()
+        if signature == self._signature:
+            return
+        keys = []
+        for student_id, name in db.session.execute(select(Student.id, Student.name)):
+            lowered = (name or '').strip().lower()
+            parts = lowered.split()
+            keys.append((lowered, name, student_id))
+            if len(parts) > 1:
+                keys.append((parts[-1], name, student_id))  # last name
+        keys.sort()
+        with self._lock:
+            self._keys, self._signature = keys, tuple(signature)
+
+    def search(self, query, limit):
+        self._refresh()
+        prefix = query.strip().lower()
+        keys = self._keys
+        results, seen = [], set()
+        i = bisect.bisect_left(keys, (prefix,))
+        while i < len(keys) and keys[i][0].startswith(prefix) and len(results) < limit:
+            _, name, student_id = keys[i]
+            if student_id not in seen:
+                seen.add(student_id)
+                results.append({'id': student_id, 'name': name})
+            i += 1
+        return results
+
+
+memory_index = MemoryIndex()
+_fts_available = {}
+
+
+def _has_fts():
+    url = str(db.engine.url)
+    if url not in _fts_available:
+        found = False
+        if db.engine.dialect.name == 'sqlite':
+            found = db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='students_fts'")).first() is not None
+        _fts_available[url] = found
+    return _fts_available[url]
+
+
+def search_students(query, limit=DEFAULT_LIMIT):
+    """Top `limit` students whose name (any word) starts with the words in `query`."""
+    tokens = TOKEN.findall(query or '')
+    if not tokens:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+    if _has_fts():
+        match = ' '.join('"%s"*' % t.replace('"', '""') for t in tokens)
+        rows = db.session.execute(text(
+            'SELECT students.id, students.name FROM students_fts '
+            'JOIN students ON students.id = students_fts.rowid '
+            'WHERE students_fts MATCH :match ORDER BY rank, students.name LIMIT :limit'),
+            {'match': match, 'limit': limit})
+        return [{'id': student_id, 'name': name} for student_id, name in rows]
+    return memory_index.search(' '.join(tokens), limit)
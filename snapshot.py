@@ -0,0 +1,98 @@
+# snapshot.py
+"""Load everything a production page needs in a fixed number of queries."""
+
+from contextlib import contextmanager
+
+from flask import current_app, abort
+from sqlalchemy import event, select
+from sqlalchemy.orm import selectinload, joinedload
+
+from models import db, Production, Role, RoleAssignment, CrewAssignment, Thanks
+
+# Production, roles, assignments (+students), crew (+students), team, songs, thanks
+SNAPSHOT_QUERY_BUDGET = 7
+
+
+class QueryCounter:
+    """Counts SQL statements executed on the engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+        self.parameters = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+        self.parameters.append(None if executemany else parameters)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+        return False
+
+
+@contextmanager
+def query_budget(limit, label='block'):
+    """Raise AssertionError if more than `limit` queries run inside the block.
+
+    Only enforced when ASSERT_QUERY_BUDGET is set in the app config, so it is
+    free in production and strict in development / benchmarks.
+    """
+    if not current_app.config.get('ASSERT_QUERY_BUDGET'):
+        yield None
+        return
+    with QueryCounter(db.engine) as counter:
+        yield counter
+    if counter.count > limit:
+        raise AssertionError(
+            f'{label} ran {counter.count} queries (budget {limit}):\n' + '\n'.join(counter.statements))
+
+
+def snapshot_statements(production_id):
+    """The (production, thanks) SELECTs behind a snapshot, shared with the async viewer (asgi.py)."""
+    production = (select(Production)
+                  .options(selectinload(Production.roles)
+                           .selectinload(Role.assignments)
+                           .joinedload(RoleAssignment.student),
+                           selectinload(Production.crew).joinedload(CrewAssignment.student),
+                           selectinload(Production.team),
+                           selectinload(Production.songs))
+                  .where(Production.id == production_id))
+    thanks = select(Thanks).where(Thanks.production_id == production_id).order_by(Thanks.id)
+    return production, thanks
+
+
+def build_snapshot(prod, thanks):
+    """Template kwargs from a loaded production and its thanks."""
+    # roles and songs come back in running order (relationship order_by)
+    cast = [{'id': r.id, 'role': r.name, 'students': [a.student.full_name() for a in r.assignments],
+             'assignments': [(a.id, a.student.full_name(), a.student_id) for a in r.assignments]}
+            for r in prod.roles]
+    return {
+        'production': prod,
+        'cast': cast,
+        'crew': sorted(prod.crew, key=lambda c: c.id),
+        'team': sorted(prod.team, key=lambda t: t.id),
+        'songs': prod.songs,
+        'thanks': thanks,
+    }
+
+
+def load_production_snapshot(production_id):
+    """Return template kwargs for a production page (production, cast, crew, team, songs, thanks).
+
+    Relationships are eager-loaded with selectinload, so the query count does not
+    grow with the number of roles, assignments or crew members.
+    """
+    production, thanks = snapshot_statements(production_id)
+    with query_budget(SNAPSHOT_QUERY_BUDGET, 'production snapshot'):
+        prod = db.session.execute(production).scalars().first()
+        if prod is None:
+            abort(404)
+        thanks = db.session.execute(thanks).scalars().all()
+    return build_snapshot(prod, thanks)
@@ -0,0 +1,87 @@
+/* Lobby live updates: applies the Server-Sent Events from live.py to the viewer page
+   (<div data-live-events="<stream url>">) instead of reloading it. */
+(function () {
+  var marker = document.querySelector('[data-live-events]');
+  if (!marker || !window.EventSource) return;
+
+  function line(parts) {
+    var p = document.createElement('p');
+    if (parts[0]) {
+      var b = document.createElement('b');
+      b.textContent = parts[0];
+      p.appendChild(b);
+    }
+    p.appendChild(document.createTextNode(parts[1] + parts[2]));
+    return p;
+  }
+
+  function empty(box) {
+    var p = document.createElement('p'), em = document.createElement('em');
+    em.textContent = box.dataset.empty;
+    p.appendChild(em);
+    return p;
+  }
+
+  function flash(el) {
+    el.classList.add('live-updated');
+    setTimeout(function () { el.classList.remove('live-updated'); }, 4000);
+  }
+
+  function roleLine(role) {
+    var p = document.createElement('p'), b = document.createElement('b'), span = document.createElement('span');
+    p.dataset.role = role.id;
+    b.textContent = role.role;
+    span.setAttribute('data-students', '');
+    p.appendChild(b);
+    p.appendChild(document.createTextNode(': '));
+    p.appendChild(span);
+    return p;
+  }
+
+  var source = new EventSource(marker.dataset.liveEvents);
+
+  source.addEventListener('reload', function () {
+    source.close();
+    window.location.reload();
+  });
+
+  source.addEventListener('production', function (e) {
+    var fields = JSON.parse(e.data);
+    Object.keys(fields).forEach(function (name) {
+      var el = document.querySelector('[data-field="' + name + '"]');
+      if (el) { el.textContent = fields[name]; flash(el); }
+    });
+  });
+
+  source.addEventListener('cast', function (e) {
+    var diff = JSON.parse(e.data), box = document.querySelector('[data-cast]');
+    if (!box) return;
+    var lines = {};
+    box.querySelectorAll('[data-role]').forEach(function (p) { lines[p.dataset.role] = p; });
+    diff.removed.forEach(function (id) { if (lines[id]) { lines[id].remove(); delete lines[id]; } });
+    diff.changed.forEach(function (role) {
+      var p = lines[role.id] || (lines[role.id] = roleLine(role));
+      p.querySelector('b').textContent = role.role;
+      var students = p.querySelector('[data-students]');
+      students.textContent = role.students;
+      if (!role.students) {
+        var em = document.createElement('em');
+        em.textContent = '—';
+        students.appendChild(em);
+      }
+      flash(p);
+    });
+    box.textContent = '';
+    diff.order.forEach(function (id) { box.appendChild(lines[id]); });
+    if (!diff.order.length) box.appendChild(empty(box));
+  });
+
+  source.addEventListener('section', function (e) {
+    var data = JSON.parse(e.data), box = document.querySelector('[data-section="' + data.section + '"]');
+    if (!box) return;
+    box.textContent = '';
+    data.lines.forEach(function (parts) { box.appendChild(line(parts)); });
+    if (!data.lines.length) box.appendChild(empty(box));
+    flash(box);
+  });
+})();
@@ -0,0 +1,62 @@
+/* Drag-and-drop running order. Items are draggable children of a [data-reorder="<kind>"] list
+   with data-id and data-move="<move url>"; items can be dropped into any list of the same kind
+   (songs between acts, via the list's data-act). After a drop the new position is posted as
+   {"after": <id of the item above, or null>, "act": <data-act>} and the server rewrites just
+   that row (ordering.py). If the move is rejected the page reloads to show the saved order. */
+(function () {
+  var dragged = null, origin = null;
+
+  function itemAbove(item) {
+    var prev = item.previousElementSibling;
+    while (prev && !prev.hasAttribute('data-move')) prev = prev.previousElementSibling;
+    return prev ? Number(prev.dataset.id) : null;
+  }
+
+  function save(item) {
+    var list = item.parentElement;
+    var body = {after: itemAbove(item)};
+    if (list.dataset.act) body.act = Number(list.dataset.act);
+    fetch(item.dataset.move, {
+      method: 'POST',
+      headers: {'Content-Type': 'application/json'},
+      body: JSON.stringify(body)
+    }).then(function (r) {
+      if (!r.ok) location.reload();
+    }, function () { location.reload(); });
+  }
+
+  document.querySelectorAll('[data-reorder]').forEach(function (list) {
+    list.addEventListener('dragstart', function (e) {
+      var item = e.target.closest && e.target.closest('[data-move]');
+      if (!item || item.parentElement !== list) return;
+      dragged = item;
+      origin = [list, item.nextElementSibling];
+      item.classList.add('is-dragging');
+      e.dataTransfer.effectAllowed = 'move';
+      e.dataTransfer.setData('text/plain', item.dataset.id);
+    });
+
+    list.addEventListener('dragover', function (e) {
+      if (!dragged || dragged.parentElement.dataset.reorder !== list.dataset.reorder) return;
+      e.preventDefault();
+      var over = e.target.closest('[data-move]');
+      if (over === dragged) return;
+      if (!over || over.parentElement !== list) {
+        if (!list.contains(dragged)) list.appendChild(dragged);
+        return;
+      }
+      var box = over.getBoundingClientRect();
+      list.insertBefore(dragged, e.clientY > box.top + box.height / 2 ? over.nextElementSibling : over);
+    });
+
+    list.addEventListener('drop', function (e) { e.preventDefault(); });
+
+    list.addEventListener('dragend', function () {
+      if (!dragged) return;
+      var item = dragged;
+      dragged = null;
+      item.classList.remove('is-dragging');
+      if (item.parentElement !== origin[0] || item.nextElementSibling !== origin[1]) save(item);
+    });
+  });
+})();
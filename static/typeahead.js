@@ -0,0 +1,68 @@
+/* Student picker: <input data-typeahead data-target="<hidden input id>" list="<datalist id>">
+   queries /api/students/search as the user types and stores the chosen id in the hidden input.
+   With data-multiple, data-target is a container: each pick becomes a removable tag holding a
+   hidden student_id input, so one submit can assign a whole ensemble. */
+(function () {
+  function debounce(fn, ms) {
+    var t;
+    return function () { clearTimeout(t); var a = arguments; t = setTimeout(function () { fn.apply(null, a); }, ms); };
+  }
+
+  document.querySelectorAll('input[data-typeahead]').forEach(function (input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var hidden = document.getElementById(input.dataset.target);
+    var byName = {};
+
+    var multiple = input.hasAttribute('data-multiple');
+
+    function addTag(id, name) {
+      if (hidden.querySelector('input[value="' + id + '"]')) return;
+      var tag = document.createElement('span');
+      tag.className = 'tag is-info is-light';
+      tag.textContent = name + ' ';
+      var field = document.createElement('input');
+      field.type = 'hidden'; field.name = 'student_id'; field.value = id;
+      var remove = document.createElement('button');
+      remove.type = 'button'; remove.className = 'delete is-small';
+      remove.addEventListener('click', function () { tag.remove(); });
+      tag.appendChild(field); tag.appendChild(remove);
+      hidden.appendChild(tag);
+    }
+
+    function sync() {
+      var id = byName[input.value];
+      if (!multiple) { hidden.value = id || ''; return; }
+      if (id) { addTag(id, input.value); input.value = ''; }
+    }
+
+    function chosen() {
+      return multiple ? hidden.querySelector('input') !== null : !!hidden.value;
+    }
+
+    var search = debounce(function (q) {
+      fetch(input.dataset.typeahead + '?limit=15&q=' + encodeURIComponent(q))
+        .then(function (r) { return r.json(); })
+        .then(function (students) {
+          list.innerHTML = '';
+          byName = {};
+          students.forEach(function (s) {
+            var opt = document.createElement('option');
+            opt.value = s.name;
+            byName[s.name] = s.id;
+            list.appendChild(opt);
+          });
+          sync();
+        });
+    }, 120);
+
+    input.addEventListener('input', function () {
+      sync();
+      if (input.value.trim().length >= 1) search(input.value.trim());
+    });
+    input.form.addEventListener('submit', function (e) {
+      sync();
+      if (!chosen()) { e.preventDefault(); input.focus(); input.setCustomValidity('Pick a student from the list'); input.reportValidity(); }
+    });
+    input.addEventListener('change', function () { input.setCustomValidity(''); sync(); });
+  });
+})();
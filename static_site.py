@@ -0,0 +1,199 @@
+# static_site.py
+"""Static export of the audience pages, so a plain file server can take the traffic.
+
+`flask --app app export-site` renders the viewer pages into STATIC_SITE_FOLDER
+(instance/site by default):
+
+    index.html, viewer/index.html                 the list of productions (the app's /viewer)
+    viewer/production/<id>/index.html             each program
+    viewer/production/<id>/program.pdf            its printable PDF (with reportlab)
+    static/...  uploads/<cover files>             the assets those pages use
+
+Point nginx (``root``; ``try_files $uri $uri/index.html``), a CDN or
+``python -m http.server`` at the folder; the viewer URLs are the same as
+the app's. The site's root is the production list rather than the app's
+home page, whose other half links to the director pages, and programs are
+rendered without the live-updates script, since no SSE server runs behind a
+file server. Exports are incremental: a manifest records the revision each page
+was rendered at, so only productions whose revision changed are rewritten,
+deleted ones are removed, and the lists are re-rendered only when titles,
+subtitles or covers changed. A change to the viewer templates or static
+files re-renders everything.
+
+With STATIC_SITE_AUTO set, every edit (routes.commit_production_change)
+schedules an export on a background thread; edits arriving while one runs
+are picked up by the next run.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, render_template
+from sqlalchemy import select
+
+from database import PRIMARY_ENVIRON
+from models import db, Production
+
+MANIFEST = '.manifest.json'
+TEMPLATES = ('base.jinja', 'viewer.jinja', 'viewer_production.jinja', 'cover.jinja')
+
+_executor = None
+_lock = threading.Lock()
+_scheduled = False
+
+
+def _write(path, data):
+    # a unique temp file per writer: several workers may export at once with STATIC_SITE_AUTO
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)  # mkstemp creates it private; the file server must read it
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _copy_if_changed(src, dst):
+    try:
+        same = os.stat(src).st_mtime_ns == os.stat(dst).st_mtime_ns and \
+            os.path.getsize(src) == os.path.getsize(dst)
+    except OSError:
+        same = False
+    if not same:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(src, dst)
+    return not same
+
+
+def _layout_hash(app):
+    """Changes when anything every page depends on changes (templates, static files)."""
+    digest = hashlib.sha256()
+    paths = [os.path.join(app.root_path, app.template_folder, name) for name in TEMPLATES]
+    for root, dirs, files in os.walk(app.static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != app.config['UPLOAD_FOLDER']]
+        paths += [os.path.join(root, f) for f in files]
+    for path in sorted(paths):
+        stat = os.stat(path)
+        digest.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()
+
+
+def _copy_static(app, folder):
+    copied = 0
+    for root, dirs, files in os.walk(app.static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != app.config['UPLOAD_FOLDER']]
+        for name in files:
+            src = os.path.join(root, name)
+            copied += _copy_if_changed(src, os.path.join(folder, 'static', os.path.relpath(src, app.static_folder)))
+    return copied
+
+
+def _copy_cover(app, folder, cover):
+    """The uploaded cover and its generated variants (same stem)."""
+    if not cover or not cover.startswith('/uploads/'):
+        return
+    stem = cover[len('/uploads/'):].rsplit('.', 1)[0]
+    uploads = app.config['UPLOAD_FOLDER']
+    for name in os.listdir(uploads):
+        if name.startswith(stem):
+            _copy_if_changed(os.path.join(uploads, name), os.path.join(folder, 'uploads', name))
+
+
+def _page(client, url):
+    resp = client.get(url, environ_base={PRIMARY_ENVIRON: True})  # the export runs right after an edit
+    if resp.status_code != 200:
+        raise RuntimeError(f'{url} answered {resp.status_code}')
+    return resp.get_data()
+
+
+def _program_page(app, production_id):
+    """routes.viewer_production's page, without the live-updates script."""
+    from snapshot import load_production_snapshot
+    with app.test_request_context(f'/viewer/production/{production_id}', environ_base={PRIMARY_ENVIRON: True}):
+        return render_template('viewer_production.jinja', static_export=True,
+                               **load_production_snapshot(production_id)).encode()
+
+
+def export_site(app=None, full=False):
+    """Bring the static folder up to date; returns counts of what was written."""
+    import program
+    from routes import listing_etag
+    app = app or current_app._get_current_object()
+    folder = app.config['STATIC_SITE_FOLDER']
+    try:
+        with open(os.path.join(folder, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    layout = _layout_hash(app)
+    if full or manifest.get('layout') != layout:
+        manifest = {'layout': layout}
+    rendered = manifest.setdefault('productions', {})
+
+    with app.app_context():
+        rows = db.session.execute(select(Production.id, Production.revision, Production.cover_filename)).all()
+        listing = hashlib.sha256(listing_etag().encode()).hexdigest()
+        db.session.remove()
+    counts = {'static': _copy_static(app, folder), 'pages': 0, 'pdfs': 0, 'removed': 0}
+    client = app.test_client()
+    current = {str(pid) for pid, _, _ in rows}
+    for pid, revision, cover in rows:
+        if rendered.get(str(pid)) == revision:
+            continue
+        base = os.path.join(folder, 'viewer', 'production', str(pid))
+        _copy_cover(app, folder, cover)
+        _write(os.path.join(base, 'index.html'), _program_page(app, pid))
+        counts['pages'] += 1
+        if program.available():
+            with app.app_context():
+                pdf_folder, filename, job = program.program_pdf(pid)
+            if job is not None:
+                job.result()
+            _copy_if_changed(os.path.join(pdf_folder, filename), os.path.join(base, 'program.pdf'))
+            counts['pdfs'] += 1
+        rendered[str(pid)] = revision
+    for pid in [p for p in rendered if p not in current]:
+        shutil.rmtree(os.path.join(folder, 'viewer', 'production', pid), ignore_errors=True)
+        del rendered[pid]
+        counts['removed'] += 1
+    if manifest.get('listing') != listing:
+        home = _page(client, '/viewer')
+        _write(os.path.join(folder, 'viewer', 'index.html'), home)
+        _write(os.path.join(folder, 'index.html'), home)
+        counts['pages'] += 2
+        manifest['listing'] = listing
+    _write(os.path.join(folder, MANIFEST), json.dumps(manifest).encode())
+    return counts
+
+
+def _run(app):
+    global _scheduled
+    with _lock:
+        _scheduled = False
+    try:
+        export_site(app)
+    except Exception:
+        app.logger.exception('static site export failed')
+
+
+def schedule():
+    """Export in the background after an edit, if STATIC_SITE_AUTO is set (coalesces bursts of edits)."""
+    global _executor, _scheduled
+    app = current_app._get_current_object()
+    if not app.config.get('STATIC_SITE_AUTO'):
+        return
+    with _lock:
+        if _scheduled:
+            return
+        _scheduled = True
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='static-site')
+    _executor.submit(_run, app)